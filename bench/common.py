@@ -0,0 +1,94 @@
+"""Shared helpers for benchmarks."""
+
+import json
+import sys
+from contextlib import contextmanager
+from os import environ
+from os.path import abspath, dirname
+from statistics import median, quantiles
+from subprocess import DEVNULL, PIPE, Popen
+from tempfile import TemporaryDirectory
+from time import sleep, time
+from typing import Dict, Iterator, List
+
+root = dirname(dirname(abspath(__file__)))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from terminalle import __version__  # noqa: E402
+
+
+@contextmanager
+def headless_session(display: int = 5) -> Iterator[Dict[str, str]]:
+    """
+    Start a private D-Bus session bus and a Broadway display server,
+    and yield environment variables for running Terminalle against them.
+
+    Requires `dbus-daemon` and `gtk4-broadwayd`.
+    """
+    with TemporaryDirectory() as tmp:
+        dbus = Popen(
+            ['dbus-daemon', '--session', '--nofork', '--print-address=1'],
+            stdout=PIPE,
+            text=True,
+        )
+        broadway = Popen(
+            ['gtk4-broadwayd', f':{display}'], stdout=DEVNULL, stderr=DEVNULL
+        )
+        try:
+            address = dbus.stdout.readline().strip()
+            # There's no readiness notification for the display server.
+            sleep(0.5)
+            yield {
+                **environ,
+                'DBUS_SESSION_BUS_ADDRESS': address,
+                'GDK_BACKEND': 'broadway',
+                'BROADWAY_DISPLAY': f':{display}',
+                'PYTHONPATH': root,
+                'XDG_CACHE_HOME': tmp,
+            }
+        finally:
+            broadway.terminate()
+            dbus.terminate()
+            broadway.wait()
+            dbus.wait()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Return the median and tail percentiles of `samples`."""
+    samples = sorted(samples)
+    if len(samples) > 1:
+        percentiles = quantiles(samples, n=100, method='inclusive')
+    else:
+        percentiles = samples * 99
+    return {
+        'min': samples[0],
+        'median': median(samples),
+        'p90': percentiles[89],
+        'p95': percentiles[94],
+        'p99': percentiles[98],
+        'max': samples[-1],
+        'count': len(samples),
+    }
+
+
+def print_summaries(summaries: Dict[str, Dict[str, float]], unit: str = 'ms'):
+    """Print a table of summaries as returned by `summarize`."""
+    width = max(len(name) for name in summaries)
+    columns = ['min', 'median', 'p90', 'p95', 'p99', 'max']
+    print(f'{"":<{width}}  ' + ' '.join(f'{column:>9}' for column in columns))
+    for name, summary in summaries.items():
+        values = ' '.join(f'{summary[column]:>9.2f}' for column in columns)
+        print(f'{name:<{width}}  {values}  {unit}')
+
+
+def record(path: str, benchmark: str, results: dict):
+    """Append `results` to the JSON lines file at `path`, tagged with the version."""
+    with open(path, 'a') as f:
+        entry = {
+            'benchmark': benchmark,
+            'version': __version__,
+            'time': time(),
+            **results,
+        }
+        f.write(json.dumps(entry) + '\n')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check which modules each command-line path imports, and how long that takes.
+
+Uses `python -X importtime` to record every module imported by each path,
+and fails if a path imports a module it should not
+(e.g. if `terminalle auto` starts pulling in GTK again).
+Each path runs the real entry point.
+Paths that need a D-Bus session or a desktop environment
+are expected to fail at that point, after importing everything they need.
+
+Run from the repository root: `python bench/imports.py`.
+"""
+
+import sys
+from argparse import ArgumentParser
+from os.path import abspath, dirname
+from os.path import join as join_path
+from subprocess import run
+from tempfile import TemporaryDirectory
+
+_root = dirname(dirname(abspath(__file__)))
+
+_gtk_modules = {
+    'gi.repository.Gdk',
+    'gi.repository.Gtk',
+    'gi.repository.Pango',
+    'gi.repository.Vte',
+}
+
+# (name, Python arguments, forbidden modules,
+# and for commands expected to fail, a module they must have imported first)
+_paths = [
+    ('--version', ['-m', 'terminalle', '--version'], {'gi'}, None),
+    (
+        'auto',
+        ['-m', 'terminalle', 'auto', '--no-start-on-login', '--no-restart-if-closed'],
+        {'gi'},
+        None,
+    ),
+    ('no-auto', ['-m', 'terminalle', 'no-auto'], {'gi'}, None),
+    # Fails to detect the desktop environment, since `XDG_CURRENT_DESKTOP` is unset.
+    (
+        'key',
+        ['-m', 'terminalle', 'key', '--toggle', '<Super>Return'],
+        _gtk_modules,
+        'gi.repository.Gio',
+    ),
+    # Fail to connect to the session bus, which points at a missing socket.
+    ('toggle', ['-m', 'terminalle', 'toggle'], _gtk_modules, 'gi.repository.Gio'),
+    ('quit', ['-m', 'terminalle', 'quit'], _gtk_modules, 'gi.repository.Gio'),
+]
+
+
+def _measure(args, environment, reached):
+    """
+    Return the import time (in microseconds) of every module imported
+    by running Python with `args`, excluding the time spent on nested imports,
+    or `None` if the command fails unexpectedly:
+    if `reached` is `None`, it must succeed,
+    otherwise it must fail after importing the module `reached`
+    (rather than e.g. failing to import it).
+    """
+    result = run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=_root,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith('import time:') and '|' in line:
+            own, _, name = line[len('import time:') :].split('|')
+            if own.strip().isdigit():
+                imports[name.strip()] = int(own)
+    if reached is None:
+        unexpected = result.returncode != 0
+    else:
+        unexpected = result.returncode == 0 or reached not in imports
+    if unexpected:
+        lines = result.stderr.strip().splitlines()
+        print(lines[-1] if lines else 'unexpected success', file=sys.stderr)
+        return None
+    return imports
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '-v', '--verbose', action='store_true', help='list every imported module'
+    )
+    args = parser.parse_args()
+
+    failed = False
+    with TemporaryDirectory() as tmp:
+        # Point the XDG directories at an empty location,
+        # so that `auto` and `no-auto` have nothing to do,
+        # and the session bus at a missing socket,
+        # so that `toggle` and `quit` fail without affecting a running server.
+        environment = {
+            'PATH': '/usr/bin:/bin',
+            'HOME': tmp,
+            'XDG_CONFIG_HOME': tmp,
+            'XDG_DATA_HOME': tmp,
+            'XDG_CONFIG_DIRS': tmp,
+            'XDG_DATA_DIRS': tmp,
+            'DBUS_SESSION_BUS_ADDRESS': f'unix:path={join_path(tmp, "missing")}',
+        }
+        for name, python_args, forbidden, reached in _paths:
+            imports = _measure(python_args, environment, reached)
+            if imports is None:
+                failed = True
+                print(f'{name:<12} ERROR')
+                continue
+            total = sum(imports.values())
+            bad = sorted(module for module in imports if module in forbidden)
+            status = 'FAIL' if bad else 'ok'
+            print(
+                f'{name:<12} {status:<4} {len(imports):>4} modules {total / 1000:>8.1f} ms'
+            )
+            if bad:
+                failed = True
+                print(f'  unexpected imports: {", ".join(bad)}')
+            if args.verbose:
+                for module, time in sorted(imports.items(), key=lambda item: -item[1]):
+                    print(f'  {time / 1000:>8.1f} ms  {module}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
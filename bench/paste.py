@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark pasting large clipboard contents into the terminal.
+
+For each size, starts a fresh process with a window and terminal
+configured like Terminalle's, on a headless Broadway display,
+puts generated text on the clipboard, and pastes it into a program
+that reads exactly that many bytes and exits.
+Pastes go either through Terminalle's chunked pipeline (`terminalle.paste`)
+or all at once through `Vte.Terminal.paste_clipboard()`, for comparison.
+Meanwhile, a periodic timeout measures how responsive the main loop stays.
+With `--crlf`, the text has CRLF line endings, one of which straddles
+the first chunk boundary, and the program checks that it received
+each as a single carriage return.
+
+Run from the repository root: `python bench/paste.py`.
+"""
+
+import json
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from itertools import product
+from os.path import join as join_path
+from subprocess import Popen, TimeoutExpired
+from tempfile import TemporaryDirectory
+
+from common import headless_session, record, summarize
+
+# How often the main loop is expected to dispatch the heartbeat timeout.
+_heartbeat_ms = 10
+
+_modes = ['chunked', 'vte']
+
+
+def _text(size: int, crlf: bool = False) -> bytes:
+    """
+    Return `size` bytes of printable lines, like a log or SQL dump.
+    With `crlf`, end lines with CRLF, and pad the start so that
+    a CR is the last byte of the first chunk and its LF the first of the next.
+    """
+    from terminalle.paste import chunk_size
+
+    line = b'INSERT INTO log VALUES (42, "the quick brown fox jumps over it");'
+    line += b'\r\n' if crlf else b'\n'
+    padding = b'-' * ((chunk_size + 1 - len(line)) % len(line)) if crlf else b''
+    return (padding + line * (size // len(line) + 1))[:size]
+
+
+def _pasted(text: bytes) -> bytes:
+    """Return what a paste of `text` should write to the PTY."""
+    return text.replace(b'\r\n', b'\r').replace(b'\n', b'\r')
+
+
+def _child(mode: str, size: int, crlf: bool, result_path: str):
+    """Time pasting `size` bytes in `mode` (see `_modes`)."""
+    import gi
+
+    gi.require_version('Gdk', '4.0')
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Vte', '3.91')
+    from time import monotonic_ns
+
+    from gi.repository import Gdk, Gio, GLib, Gtk, Vte
+
+    from terminalle.paste import Paster, mime_types
+    from terminalle.settings import load as load_settings
+    from terminalle.terminalle import new_terminal, new_window
+
+    settings = load_settings('/nonexistent/terminalle.yaml', cache=False)
+    text = _text(size, crlf)
+    expected = _pasted(text)
+    received_path = result_path + '.received'
+    app = Gtk.Application(flags=Gio.ApplicationFlags.NON_UNIQUE)
+    result = {'lateness_ms': []}
+    state = {}
+
+    def _on_heartbeat() -> bool:
+        now = monotonic_ns()
+        result['lateness_ms'].append(max(0, now - state['expected']) / 1e6)
+        state['expected'] = now + _heartbeat_ms * 1_000_000
+        return True
+
+    def _on_clipboard_read(clipboard, read_result):
+        stream, _ = clipboard.read_finish(read_result)
+        Paster(state['terminal'], stream, lambda pasted: None, _on_pasted).start()
+
+    def _on_pasted(error):
+        if error is not None:
+            raise RuntimeError(error)
+
+    def _on_spawned(terminal, pid, error, *args):
+        if error is not None:
+            raise RuntimeError(error.message)
+        # Give the reader a moment to set up the terminal.
+        GLib.timeout_add(200, _paste, terminal)
+
+    def _paste(terminal) -> bool:
+        state['start'] = monotonic_ns()
+        state['expected'] = state['start'] + _heartbeat_ms * 1_000_000
+        GLib.timeout_add(_heartbeat_ms, _on_heartbeat, priority=GLib.PRIORITY_HIGH)
+        if mode == 'vte':
+            terminal.paste_clipboard()
+        else:
+            terminal.get_clipboard().read_async(
+                mime_types, GLib.PRIORITY_DEFAULT, None, _on_clipboard_read
+            )
+        return GLib.SOURCE_REMOVE
+
+    def _on_exited(terminal, status):
+        result['seconds'] = (monotonic_ns() - state['start']) / 1e9
+        with open(received_path, 'rb') as f:
+            result['intact'] = f.read() == expected
+        with open(result_path, 'w') as f:
+            json.dump(result, f)
+        app.quit()
+
+    def _on_activate(app):
+        window = new_window(app)
+        terminal = new_terminal(settings)
+        terminal.connect('child-exited', _on_exited)
+        window.set_child(terminal)
+        window.present()
+        state['terminal'] = terminal
+        terminal.get_clipboard().set_content(
+            Gdk.ContentProvider.new_for_bytes(mime_types[0], GLib.Bytes.new(text))
+        )
+        # Read the pasted bytes without echoing them or buffering lines.
+        terminal.spawn_async(
+            Vte.PtyFlags.DEFAULT,
+            None,
+            [
+                'sh',
+                '-c',
+                f'stty raw -echo && head -c {len(expected)} > "$0"',
+                received_path,
+            ],
+            None,
+            GLib.SpawnFlags.SEARCH_PATH,
+            None,
+            (),
+            -1,
+            None,
+            _on_spawned,
+            (),
+        )
+
+    app.connect('activate', _on_activate)
+    app.run(None)
+
+
+def _run(environment: dict, mode: str, size: int, crlf: bool, tmp: str) -> dict:
+    result_path = join_path(tmp, 'result.json')
+    child = Popen(
+        [
+            sys.executable,
+            __file__,
+            '--child',
+            mode,
+            str(size),
+            str(int(crlf)),
+            result_path,
+        ],
+        env=environment,
+    )
+    try:
+        child.wait(timeout=600)
+    except TimeoutExpired:
+        child.kill()
+        child.wait()
+        raise RuntimeError('Timed out waiting for the paste')
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--size',
+        nargs='+',
+        type=float,
+        default=[0.1, 1, 8],
+        help='clipboard sizes to paste, in MB (default: 0.1 1 8)',
+    )
+    parser.add_argument(
+        '--mode',
+        nargs='+',
+        choices=_modes,
+        default=_modes,
+        help='paste pipelines to compare (default: all)',
+    )
+    parser.add_argument(
+        '--crlf',
+        action='store_true',
+        help='paste text with CRLF line endings, and check each became one newline',
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH', help='append results to a JSON lines file'
+    )
+    parser.add_argument('--child', nargs=4, metavar='ARG', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        mode, size, crlf, result_path = args.child
+        _child(mode, int(size), crlf == '1', result_path)
+        return
+
+    results = []
+    print(
+        f'{"mode":<8} {"MB":>6} {"MB/s":>8} {"lag p50":>8} {"lag p99":>8}'
+        f' {"lag max":>8}'
+    )
+    with headless_session() as environment, TemporaryDirectory() as tmp:
+        for size, mode in product(args.size, args.mode):
+            result = _run(environment, mode, int(size * 1e6), args.crlf, tmp)
+            if not result['intact']:
+                raise RuntimeError(f'{mode}: the pasted text arrived altered')
+            throughput = size / result['seconds']
+            lateness = summarize(result['lateness_ms'] or [0])
+            print(
+                f'{mode:<8} {size:>6.1f} {throughput:>8.2f} {lateness["median"]:>8.2f}'
+                f' {lateness["p99"]:>8.2f} {lateness["max"]:>8.2f}'
+            )
+            results.append(
+                {
+                    'mode': mode,
+                    'size_mb': size,
+                    'crlf': args.crlf,
+                    'mb_per_second': throughput,
+                    'main_loop_lateness_ms': lateness,
+                }
+            )
+    if args.output is not None:
+        record(args.output, 'paste', {'runs': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark searching a long scrollback.
+
+For each scrollback length, starts a fresh process with a window and terminal
+configured like Terminalle's, on a headless Broadway display,
+fills the scrollback with synthetic log lines, then searches backward
+from the bottom of the screen for a pattern that matches only the first line
+(the worst case that still finds something) or nothing at all.
+Searches go either through Terminalle's incremental search (`terminalle.search`)
+or straight to `Vte.Terminal.search_find_previous()`, for comparison.
+Meanwhile, a periodic timeout measures how responsive the main loop stays.
+
+Run from the repository root: `python bench/search.py`.
+"""
+
+import json
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from itertools import product
+from os.path import join as join_path
+from subprocess import Popen, TimeoutExpired
+from tempfile import TemporaryDirectory
+
+from common import headless_session, record, summarize
+
+# How often the main loop is expected to dispatch the heartbeat timeout.
+_heartbeat_ms = 10
+
+_modes = ['incremental', 'vte']
+
+# Patterns to search for, by case.
+_patterns = {'first': r'needle-\d+', 'none': r'haystack-\d+'}
+
+# How many lines to feed the terminal at a time.
+_lines_per_feed = 10000
+
+
+def _line(index: int) -> bytes:
+    return f'{index:>8} INFO request served in {index % 997} ms from cache\r\n'.encode()
+
+
+def _child(mode: str, case: str, lines: int, result_path: str):
+    """Time searching `lines` of scrollback for `case` in `mode` (see `_modes`)."""
+    import gi
+
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Vte', '3.91')
+    from time import monotonic_ns
+
+    from gi.repository import Gio, GLib, Gtk
+
+    from terminalle.search import Search, compile_pattern
+    from terminalle.settings import load as load_settings
+    from terminalle.terminalle import new_terminal, new_window
+
+    settings = load_settings('/nonexistent/terminalle.yaml', cache=False)
+    settings['scrollback_lines'] = -1
+    app = Gtk.Application(flags=Gio.ApplicationFlags.NON_UNIQUE)
+    result = {'lateness_ms': []}
+    state = {}
+
+    def _on_heartbeat() -> bool:
+        now = monotonic_ns()
+        result['lateness_ms'].append(max(0, now - state['expected']) / 1e6)
+        state['expected'] = now + _heartbeat_ms * 1_000_000
+        return True
+
+    def _feed(terminal, start: int) -> bool:
+        end = min(lines, start + _lines_per_feed)
+        text = b''.join(_line(index) for index in range(start, end))
+        if start == 0:
+            text = b'needle-0\r\n' + text
+        terminal.feed(text)
+        if end < lines:
+            GLib.idle_add(_feed, terminal, end)
+        else:
+            # Let the terminal settle before searching.
+            GLib.timeout_add(500, _search, terminal)
+        return GLib.SOURCE_REMOVE
+
+    def _search(terminal) -> bool:
+        state['start'] = monotonic_ns()
+        state['expected'] = state['start'] + _heartbeat_ms * 1_000_000
+        GLib.timeout_add(_heartbeat_ms, _on_heartbeat, priority=GLib.PRIORITY_HIGH)
+        if mode == 'vte':
+            regex = compile_pattern(_patterns[case], '')
+            terminal.search_set_regex(regex, 0)
+            terminal.search_set_wrap_around(True)
+            found = terminal.search_find_previous()
+            result['seconds'] = (monotonic_ns() - state['start']) / 1e9
+            # Let the heartbeat report how late it was.
+            GLib.timeout_add(2 * _heartbeat_ms, _on_found, found)
+        else:
+            search = Search(terminal, _patterns[case])
+            state['search'] = search
+            search.find(True, _on_found)
+        return GLib.SOURCE_REMOVE
+
+    def _on_found(found: bool) -> bool:
+        result.setdefault('seconds', (monotonic_ns() - state['start']) / 1e9)
+        result['found'] = found
+        with open(result_path, 'w') as f:
+            json.dump(result, f)
+        app.quit()
+        return GLib.SOURCE_REMOVE
+
+    def _on_activate(app):
+        window = new_window(app)
+        terminal = new_terminal(settings)
+        window.set_child(terminal)
+        window.present()
+        GLib.idle_add(_feed, terminal, 0)
+
+    app.connect('activate', _on_activate)
+    app.run(None)
+
+
+def _run(environment: dict, mode: str, case: str, lines: int, tmp: str) -> dict:
+    result_path = join_path(tmp, 'result.json')
+    child = Popen(
+        [sys.executable, __file__, '--child', mode, case, str(lines), result_path],
+        env=environment,
+    )
+    try:
+        child.wait(timeout=1200)
+    except TimeoutExpired:
+        child.kill()
+        child.wait()
+        raise RuntimeError('Timed out waiting for the search')
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--lines',
+        nargs='+',
+        type=int,
+        default=[100_000, 1_000_000],
+        help='scrollback lengths to search (default: 100000 1000000)',
+    )
+    parser.add_argument(
+        '--mode',
+        nargs='+',
+        choices=_modes,
+        default=_modes,
+        help='search implementations to compare (default: all)',
+    )
+    parser.add_argument(
+        '--case',
+        nargs='+',
+        choices=sorted(_patterns),
+        default=sorted(_patterns),
+        help='whether the pattern matches the first line or nothing (default: all)',
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH', help='append results to a JSON lines file'
+    )
+    parser.add_argument('--child', nargs=4, metavar='ARG', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        mode, case, lines, result_path = args.child
+        _child(mode, case, int(lines), result_path)
+        return
+
+    results = []
+    print(
+        f'{"mode":<12} {"case":<6} {"lines":>8} {"found":>6} {"seconds":>8}'
+        f' {"lag p50":>8} {"lag p99":>8} {"lag max":>8}'
+    )
+    with headless_session() as environment, TemporaryDirectory() as tmp:
+        for lines, case, mode in product(args.lines, args.case, args.mode):
+            result = _run(environment, mode, case, lines, tmp)
+            lateness = summarize(result['lateness_ms'] or [0])
+            print(
+                f'{mode:<12} {case:<6} {lines:>8} {str(result["found"]):>6}'
+                f' {result["seconds"]:>8.2f} {lateness["median"]:>8.2f}'
+                f' {lateness["p99"]:>8.2f} {lateness["max"]:>8.2f}'
+            )
+            results.append(
+                {
+                    'mode': mode,
+                    'case': case,
+                    'lines': lines,
+                    'found': result['found'],
+                    'seconds': result['seconds'],
+                    'main_loop_lateness_ms': lateness,
+                }
+            )
+    if args.output is not None:
+        record(args.output, 'search', {'runs': results})
+
+
+if __name__ == '__main__':
+    main()
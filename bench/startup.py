@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark startup latency, from process start to D-Bus readiness and first frame.
+
+Each run starts a fresh server process against a private D-Bus session bus
+and a headless Broadway display,
+and times each phase of startup using the hooks in `terminalle.instrument`.
+
+Run from the repository root: `python bench/startup.py`.
+"""
+
+import json
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from os import _exit
+from os.path import join as join_path
+from subprocess import Popen, TimeoutExpired
+from tempfile import TemporaryDirectory
+from time import monotonic_ns
+
+from common import headless_session, print_summaries, record, summarize
+
+# (phase, starting mark, ending mark)
+_phases = [
+    ('process', 'start', 'main'),
+    ('imports', 'main', 'imported'),
+    ('settings', 'imported', 'settings-loaded'),
+    ('dbus', 'settings-loaded', 'dbus-registered'),
+    ('app-startup', 'dbus-registered', 'activate'),
+    ('activate', 'activate', 'activated'),
+    ('shell-spawn', 'activated', 'spawned'),
+    ('first-frame', 'spawned', 'first-frame'),
+    ('total-dbus', 'start', 'dbus-registered'),
+    ('total-ready', 'start', 'spawned'),
+    ('total-frame', 'start', 'first-frame'),
+]
+
+
+def _child(config: str, result_path: str, last_mark: str):
+    """Run the server, recording marks until `last_mark`, then exit immediately."""
+    from terminalle import instrument
+
+    marks = {}
+
+    def _hook(name: str, time: int):
+        marks[name] = time
+        if name == last_mark:
+            with open(result_path, 'w') as f:
+                json.dump(marks, f)
+            _exit(0)
+
+    instrument.add_hook(_hook)
+    sys.argv = ['terminalle', '--config', config]
+    if last_mark == 'first-frame':
+        sys.argv.append('--show')
+    from terminalle.__main__ import main
+
+    main()
+
+
+def _run(environment: dict, config: str, last_mark: str, tmp: str) -> dict:
+    result_path = join_path(tmp, 'marks.json')
+    start = monotonic_ns()
+    child = Popen(
+        [sys.executable, __file__, '--child', result_path, '--config', config]
+        + (['--no-show'] if last_mark != 'first-frame' else []),
+        env=environment,
+    )
+    try:
+        child.wait(timeout=30)
+    except TimeoutExpired:
+        child.kill()
+        child.wait()
+        raise RuntimeError('Timed out waiting for the server to start')
+    with open(result_path) as f:
+        marks = json.load(f)
+    marks['start'] = start
+    return marks
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '-n', '--runs', type=int, default=20, help='number of runs (default: 20)'
+    )
+    parser.add_argument(
+        '-c',
+        '--config',
+        metavar='PATH',
+        default='/nonexistent/terminalle.yaml',
+        help='config file for the server (default: none, i.e. the defaults)',
+    )
+    parser.add_argument(
+        '--no-show',
+        action='store_true',
+        help='start hidden and stop once the shell has been spawned',
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH', help='append results to a JSON lines file'
+    )
+    parser.add_argument('--child', metavar='PATH', help=SUPPRESS)
+    args = parser.parse_args()
+    last_mark = 'spawned' if args.no_show else 'first-frame'
+
+    if args.child is not None:
+        _child(args.config, args.child, last_mark)
+        return
+
+    samples = {phase: [] for phase, _, _ in _phases}
+    with headless_session() as environment, TemporaryDirectory() as tmp:
+        for _ in range(args.runs):
+            marks = _run(environment, args.config, last_mark, tmp)
+            for phase, begin, end in _phases:
+                if begin in marks and end in marks:
+                    samples[phase].append((marks[end] - marks[begin]) / 1e6)
+    summaries = {phase: summarize(s) for phase, s in samples.items() if s}
+    print_summaries(summaries)
+    if args.output is not None:
+        record(args.output, 'startup', {'runs': args.runs, 'phases_ms': summaries})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Benchmark PTY output throughput across rendering settings.
+
+For each combination of settings and each corpus,
+starts a fresh process with a window and terminal configured like Terminalle's,
+on a headless Broadway display,
+and times `cat` writing the corpus through the terminal's PTY.
+Meanwhile, a periodic timeout measures how responsive the main loop stays.
+With `--links on`, the terminal also has link patterns (see `_links`),
+which the timeout checks at the center of the terminal, as if it were hovered.
+With `--log gzip` (or `text` or `zstd`), the output is also recorded
+by a session log, like with the `log-directory` setting.
+
+Run from the repository root: `python bench/throughput.py`.
+"""
+
+import json
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from itertools import product
+from os.path import join as join_path
+from random import Random
+from subprocess import Popen, TimeoutExpired
+from tempfile import TemporaryDirectory
+
+from common import headless_session, record, summarize
+
+# How often the main loop is expected to dispatch the heartbeat timeout.
+_heartbeat_ms = 10
+
+_words = (
+    'build warning error linking compiling test passed failed src lib include'
+    ' object module target debug release cache fetch resolve install'
+).split()
+_wide = '漢字仮名交じり文한국어中文字符𝓤𝓷𝓲𝓬𝓸𝓭𝓮🙂🚀🎉✨'
+
+# The default URL pattern, plus compiler locations and git hashes.
+_links = [
+    {'pattern': r'\b(?:https?|ftp)://[^\s<>"\'`]*[^\s<>"\'`.,:;!?)\]}]'},
+    {
+        'pattern': r'(?P<path>[\w./-]+\.\w+):(?P<line>\d+)',
+        'open': 'file://{cwd}/{path}',
+    },
+    {'pattern': r'\b[0-9a-f]{7,40}\b', 'run': 'git -C {cwd} show {0}'},
+]
+
+
+def _ascii_line(random: Random, index: int) -> str:
+    words = ' '.join(random.choice(_words) for _ in range(random.randint(4, 14)))
+    return f'[{index:08d}] {words}\r\n'
+
+
+def _sgr_line(random: Random, index: int) -> str:
+    words = ' '.join(
+        f'\x1b[{random.choice("0123")};38;5;{random.randrange(256)}m{word}'
+        for word in _ascii_line(random, index).split()
+    )
+    return f'{words}\x1b[0m\r\n'
+
+
+def _wide_line(random: Random, index: int) -> str:
+    return ''.join(random.choice(_wide) for _ in range(random.randint(10, 40))) + '\r\n'
+
+
+def _hyperlink_line(random: Random, index: int) -> str:
+    links = ' '.join(
+        f'\x1b]8;;https://example.com/{index}/{word}\x1b\\{word}\x1b]8;;\x1b\\'
+        for word in _ascii_line(random, index).split()
+    )
+    return f'{links}\r\n'
+
+
+def _link_line(random: Random, index: int) -> str:
+    words = _ascii_line(random, index).split()
+    return (
+        f'{words[0]} src/{random.choice(_words)}.c:{index % 1000}: warning:'
+        f' see https://example.com/{index}/{words[-1]}'
+        f' in {random.getrandbits(40):010x}\r\n'
+    )
+
+
+_corpora = {
+    'ascii': _ascii_line,
+    'sgr': _sgr_line,
+    'wide': _wide_line,
+    'hyperlink': _hyperlink_line,
+    'links': _link_line,
+}
+
+
+def _write_corpus(path: str, line, size: int):
+    """Write deterministic lines to `path` until it holds at least `size` bytes."""
+    random = Random(0)
+    written = 0
+    with open(path, 'wb') as f:
+        index = 0
+        while written < size:
+            data = line(random, index).encode()
+            f.write(data)
+            written += len(data)
+            index += 1
+
+
+def _child(options: dict, result_path: str):
+    """Time writing the corpus through a terminal configured by `options`."""
+    import gi
+
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Vte', '3.91')
+    from time import monotonic_ns
+
+    from gi.repository import Gio, GLib, Gtk, Vte
+
+    from terminalle.links import add_links
+    from terminalle.session_log import SessionLog
+    from terminalle.settings import load as load_settings
+    from terminalle.terminalle import new_terminal, new_window
+
+    settings = load_settings(options['config'], cache=False)
+    settings['colors'] = settings['colors'][: options['palette']]
+    app = Gtk.Application(flags=Gio.ApplicationFlags.NON_UNIQUE)
+    result = {'lateness_ms': []}
+    state = {}
+
+    def _on_heartbeat() -> bool:
+        now = monotonic_ns()
+        result['lateness_ms'].append(max(0, now - state['expected']) / 1e6)
+        state['expected'] = now + _heartbeat_ms * 1_000_000
+        if options['links']:
+            terminal = state['terminal']
+            terminal.check_match_at(terminal.get_width() / 2, terminal.get_height() / 2)
+        return True
+
+    def _on_spawned(terminal, pid, error, *args):
+        if error is not None:
+            raise RuntimeError(error.message)
+        state['start'] = monotonic_ns()
+        state['expected'] = state['start'] + _heartbeat_ms * 1_000_000
+        GLib.timeout_add(_heartbeat_ms, _on_heartbeat, priority=GLib.PRIORITY_HIGH)
+
+    def _on_exited(terminal, status):
+        result['seconds'] = (monotonic_ns() - state['start']) / 1e9
+        if 'log' in state:
+            state['log'].close()
+            state['log'].join(60)
+            result['log_dropped_bytes'] = state['log'].dropped
+        with open(result_path, 'w') as f:
+            json.dump(result, f)
+        app.quit()
+
+    def _on_activate(app):
+        window = new_window(app)
+        terminal = new_terminal(settings)
+        terminal.set_allow_bold(options['bold'])
+        terminal.set_allow_hyperlink(options['hyperlink'])
+        add_links(terminal, settings['links'])
+        state['terminal'] = terminal
+        if options['log'] != 'off':
+            state['log'] = SessionLog(
+                options['log_directory'], options['log'], 64 * 1024 * 1024, 86400
+            )
+            state['log'].attach(terminal)
+        terminal.connect('child-exited', _on_exited)
+        window.set_child(terminal)
+        window.present()
+        terminal.spawn_async(
+            Vte.PtyFlags.DEFAULT,
+            None,
+            ['cat', options['corpus']],
+            None,
+            GLib.SpawnFlags.SEARCH_PATH,
+            None,
+            (),
+            -1,
+            None,
+            _on_spawned,
+            (),
+        )
+
+    app.connect('activate', _on_activate)
+    app.run(None)
+
+
+def _run(environment: dict, options: dict, tmp: str) -> dict:
+    result_path = join_path(tmp, 'result.json')
+    options_path = join_path(tmp, 'options.json')
+    with open(options_path, 'w') as f:
+        json.dump(options, f)
+    child = Popen(
+        [sys.executable, __file__, '--child', options_path, result_path],
+        env=environment,
+    )
+    try:
+        child.wait(timeout=600)
+    except TimeoutExpired:
+        child.kill()
+        child.wait()
+        raise RuntimeError('Timed out waiting for the terminal')
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def _on_off(value: str) -> bool:
+    if value not in ('on', 'off'):
+        raise ValueError(value)
+    return value == 'on'
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--size',
+        type=float,
+        default=8,
+        help='size of each corpus in MB (default: 8)',
+    )
+    parser.add_argument(
+        '--corpus',
+        nargs='+',
+        choices=list(_corpora),
+        default=list(_corpora),
+        help='corpora to feed (default: all)',
+    )
+    parser.add_argument(
+        '--opacity',
+        nargs='+',
+        type=float,
+        default=[1.0, 0.75],
+        help='opacities to compare (default: 1.0 0.75)',
+    )
+    parser.add_argument(
+        '--bold',
+        nargs='+',
+        type=_on_off,
+        default=[True, False],
+        help='whether to allow bold text: on and/or off (default: both)',
+    )
+    parser.add_argument(
+        '--hyperlink',
+        nargs='+',
+        type=_on_off,
+        default=[True, False],
+        help='whether to allow hyperlinks: on and/or off (default: both)',
+    )
+    parser.add_argument(
+        '--links',
+        nargs='+',
+        type=_on_off,
+        default=[False],
+        help='whether to add link patterns: on and/or off (default: off)',
+    )
+    parser.add_argument(
+        '--log',
+        nargs='+',
+        choices=['off', 'text', 'gzip', 'zstd'],
+        default=['off'],
+        help='session log formats to compare, or off (default: off)',
+    )
+    parser.add_argument(
+        '--palette',
+        nargs='+',
+        type=int,
+        choices=[8, 16],
+        default=[8, 16],
+        help='palette sizes to compare (default: 8 16)',
+    )
+    parser.add_argument(
+        '--font',
+        nargs='+',
+        default=['monospace 13'],
+        help="fonts to compare (default: 'monospace 13')",
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH', help='append results to a JSON lines file'
+    )
+    parser.add_argument('--child', nargs=2, metavar='PATH', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        with open(args.child[0]) as f:
+            options = json.load(f)
+        _child(options, args.child[1])
+        return
+
+    results = []
+    header = (
+        f'{"corpus":<10} {"opacity":>7} {"bold":>4} {"link":>4} {"pats":>4}'
+        f' {"log":>4} {"pal":>3}'
+        f' {"font":<16} {"MB/s":>8} {"lag p50":>8} {"lag p99":>8} {"lag max":>8}'
+    )
+    print(header)
+    with headless_session() as environment, TemporaryDirectory() as tmp:
+        corpora = {}
+        for name in args.corpus:
+            corpora[name] = join_path(tmp, f'{name}.txt')
+            _write_corpus(corpora[name], _corpora[name], int(args.size * 1e6))
+        for corpus, opacity, bold, hyperlink, links, log, palette, font in product(
+            args.corpus,
+            args.opacity,
+            args.bold,
+            args.hyperlink,
+            args.links,
+            args.log,
+            args.palette,
+            args.font,
+        ):
+            config = join_path(tmp, 'terminalle.yaml')
+            with open(config, 'w') as f:
+                # YAML is a superset of JSON.
+                json.dump(
+                    {
+                        'font': font,
+                        'opacity': opacity,
+                        'links': _links if links else [],
+                    },
+                    f,
+                )
+            options = {
+                'config': config,
+                'corpus': corpora[corpus],
+                'bold': bold,
+                'hyperlink': hyperlink,
+                'links': links,
+                'log': log,
+                'log_directory': join_path(tmp, 'log'),
+                'palette': palette,
+            }
+            result = _run(environment, options, tmp)
+            throughput = int(args.size * 1e6) / result['seconds'] / 1e6
+            lateness = summarize(result['lateness_ms'] or [0])
+            print(
+                f'{corpus:<10} {opacity:>7.2f} {"on" if bold else "off":>4}'
+                f' {"on" if hyperlink else "off":>4} {"on" if links else "off":>4}'
+                f' {log:>4} {palette:>3} {font:<16}'
+                f' {throughput:>8.2f} {lateness["median"]:>8.2f}'
+                f' {lateness["p99"]:>8.2f} {lateness["max"]:>8.2f}'
+            )
+            results.append(
+                {
+                    'corpus': corpus,
+                    'opacity': opacity,
+                    'bold': bold,
+                    'hyperlink': hyperlink,
+                    'links': links,
+                    'log': log,
+                    'log_dropped_bytes': result.get('log_dropped_bytes'),
+                    'palette': palette,
+                    'font': font,
+                    'mb_per_second': throughput,
+                    'main_loop_lateness_ms': lateness,
+                }
+            )
+    if args.output is not None:
+        record(args.output, 'throughput', {'size_mb': args.size, 'runs': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Load-test the D-Bus Toggle method and report its latency distribution.
+
+Starts the server on a private session bus and a headless Broadway display,
+then sends Toggle calls at a configurable rate over several connections.
+For each call, it records the time until the reply,
+and the time until the server next applied a visibility change
+(reported by the server through `terminalle.instrument`).
+Beforehand, it times a few `Show` calls, which reply once a frame has been painted,
+to compare showing the window for the first time (see the `prewarm` setting)
+with showing it again.
+It also tracks how many `GLib.idle_add` callbacks the server has outstanding,
+which must stay bounded no matter how fast calls arrive.
+
+Run from the repository root: `python bench/toggle.py`.
+"""
+
+import json
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from bisect import bisect_left
+from os.path import join as join_path
+from subprocess import Popen
+from tempfile import TemporaryDirectory
+from time import monotonic_ns, sleep
+
+from common import headless_session, print_summaries, record, summarize
+
+from terminalle.client import OBJECT_PATH, SERVICE_NAME
+
+# Marks recorded by the server.
+_server_marks = {'dbus-call', 'visibility-applied'}
+
+
+def _server(result_path: str, config: str):
+    """Run the server, counting outstanding idle callbacks and recording marks."""
+    import gi
+
+    gi.require_version('GLib', '2.0')
+    from gi.repository import GLib
+
+    from terminalle import instrument
+
+    marks = {name: [] for name in _server_marks}
+    idle = {'outstanding': 0, 'max_outstanding': 0}
+
+    def _hook(name: str, time: int):
+        if name in marks:
+            marks[name].append(time)
+
+    idle_add = GLib.idle_add
+
+    def _counting_idle_add(function, *args, **kwargs):
+        idle['outstanding'] += 1
+        idle['max_outstanding'] = max(idle['max_outstanding'], idle['outstanding'])
+
+        def _wrapper(*args):
+            result = function(*args)
+            if not result:
+                idle['outstanding'] -= 1
+            return result
+
+        return idle_add(_wrapper, *args, **kwargs)
+
+    GLib.idle_add = _counting_idle_add
+    instrument.add_hook(_hook)
+    sys.argv = ['terminalle', '--config', config]
+    from terminalle.__main__ import main
+
+    main()
+    with open(result_path, 'w') as f:
+        json.dump({'marks': marks, 'idle': idle}, f)
+
+
+def _load(address: str, calls: int, rate: float, concurrency: int, settle: float):
+    """
+    Time a few `Show` calls, each of which replies once a frame has been painted,
+    the first one after waiting `settle` seconds for the server to finish starting up.
+    Then send `calls` Toggle calls at `rate` calls per second (0 for unlimited)
+    round-robin over `concurrency` connections.
+    Return the durations of the `Show` calls in milliseconds,
+    and the send and reply times of each Toggle call.
+    """
+    import gi
+
+    gi.require_version('Gio', '2.0')
+    from gi.repository import Gio, GLib
+
+    flags = (
+        Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT
+        | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+    )
+    connections = [
+        Gio.DBusConnection.new_for_address_sync(address, flags, None, None)
+        for _ in range(concurrency)
+    ]
+    # Wait until the server is ready: calls are queued until then.
+    connections[0].call_sync(
+        SERVICE_NAME,
+        OBJECT_PATH,
+        SERVICE_NAME,
+        'GetState',
+        None,
+        None,
+        Gio.DBusCallFlags.NONE,
+        -1,
+        None,
+    )
+
+    def _call_sync(method: str):
+        connections[0].call_sync(
+            SERVICE_NAME,
+            OBJECT_PATH,
+            SERVICE_NAME,
+            method,
+            None,
+            None,
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+        )
+
+    sleep(settle)
+    shows = []
+    for _ in range(5):
+        begin = monotonic_ns()
+        _call_sync('Show')
+        shows.append((monotonic_ns() - begin) / 1e6)
+        _call_sync('Hide')
+
+    loop = GLib.MainLoop()
+    sent = [0] * calls
+    replied = [0] * calls
+    state = {'next': 0, 'replies': 0}
+    start = monotonic_ns()
+
+    def _on_reply(connection, result, index):
+        connection.call_finish(result)
+        replied[index] = monotonic_ns()
+        state['replies'] += 1
+        if state['replies'] == calls:
+            loop.quit()
+
+    def _send():
+        now = monotonic_ns()
+        due = calls if rate <= 0 else min(calls, int((now - start) * rate / 1e9) + 1)
+        while state['next'] < due:
+            index = state['next']
+            state['next'] += 1
+            sent[index] = monotonic_ns()
+            connections[index % concurrency].call(
+                SERVICE_NAME,
+                OBJECT_PATH,
+                SERVICE_NAME,
+                'Toggle',
+                None,
+                None,
+                Gio.DBusCallFlags.NONE,
+                -1,
+                None,
+                _on_reply,
+                index,
+            )
+        return state['next'] < calls
+
+    GLib.timeout_add(1, _send)
+    loop.run()
+    _call_sync('Quit')
+    return shows, sent, replied
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '-n', '--calls', type=int, default=2000, help='number of calls (default: 2000)'
+    )
+    parser.add_argument(
+        '-r',
+        '--rate',
+        type=float,
+        default=500,
+        help='calls per second, or 0 for unlimited (default: 500)',
+    )
+    parser.add_argument(
+        '-j',
+        '--concurrency',
+        type=int,
+        default=4,
+        help='number of client connections (default: 4)',
+    )
+    parser.add_argument(
+        '--settle',
+        type=float,
+        default=1.0,
+        help='seconds to wait after startup before the first Show (default: 1)',
+    )
+    parser.add_argument(
+        '-c',
+        '--config',
+        metavar='PATH',
+        default='/nonexistent/terminalle.yaml',
+        help='config file for the server (default: none, i.e. the defaults)',
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='PATH', help='append results to a JSON lines file'
+    )
+    parser.add_argument('--server', metavar='PATH', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.server is not None:
+        _server(args.server, args.config)
+        return
+
+    with headless_session() as environment, TemporaryDirectory() as tmp:
+        result_path = join_path(tmp, 'server.json')
+        server = Popen(
+            [
+                sys.executable,
+                __file__,
+                '--server',
+                result_path,
+                '--config',
+                args.config,
+            ],
+            env=environment,
+        )
+        try:
+            # Give the server a chance to acquire its name before calling it.
+            sleep(0.5)
+            shows, sent, replied = _load(
+                environment['DBUS_SESSION_BUS_ADDRESS'],
+                args.calls,
+                args.rate,
+                args.concurrency,
+                args.settle,
+            )
+            server.wait(timeout=30)
+        finally:
+            if server.poll() is None:
+                server.kill()
+        with open(result_path) as f:
+            server_results = json.load(f)
+
+    # Pair calls with the server's receipts in order,
+    # skipping the initial `GetState`, `Show` and `Hide` calls, and the final `Quit`.
+    # With several connections this is approximate,
+    # since the server may receive calls in a slightly different order.
+    marks = server_results['marks']
+    skipped = 1 + 2 * len(shows)
+    received = sorted(marks['dbus-call'])[skipped : skipped + len(sent)]
+    applied = sorted(marks['visibility-applied'])
+    changes = len(applied) - 2 * len(shows)
+    visible = []
+    for send_time, receive_time in zip(sorted(sent), received):
+        index = bisect_left(applied, receive_time)
+        if index < len(applied):
+            visible.append((applied[index] - send_time) / 1e6)
+    summaries = {
+        'reply': summarize([(r - s) / 1e6 for s, r in zip(sent, replied)]),
+        'visible': summarize(visible),
+        'first-show': summarize(shows[:1]),
+        'later-show': summarize(shows[1:]),
+    }
+    print_summaries(summaries)
+    idle = server_results['idle']
+    print(
+        f'visibility changes: {changes} for {len(sent)} calls;'
+        f' idle callbacks outstanding: max {idle["max_outstanding"]},'
+        f' at exit {idle["outstanding"]}'
+    )
+    if args.output is not None:
+        record(
+            args.output,
+            'toggle',
+            {
+                'calls': args.calls,
+                'rate': args.rate,
+                'concurrency': args.concurrency,
+                'latency_ms': summaries,
+                'visibility_changes': changes,
+                'idle': idle,
+            },
+        )
+    # Each call may add at most a bounded number of idle callbacks at a time;
+    # anything proportional to the number of calls indicates a backlog.
+    if idle['max_outstanding'] > max(16, args.concurrency * 4):
+        print('FAIL: idle callbacks grew with the number of calls', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
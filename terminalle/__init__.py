@@ -1,4 +1,15 @@
-from .settings import load as load_settings
-from .terminalle import Terminalle
-
 __version__ = '2.0.1'
+
+
+def __getattr__(name: str):
+    # Load the GTK application lazily,
+    # so that command-line tools (e.g. `terminalle toggle`) don't pay for it.
+    if name == 'Terminalle':
+        from .terminalle import Terminalle
+
+        return Terminalle
+    elif name == 'load_settings':
+        from .settings import load
+
+        return load
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -1,18 +1,14 @@
 #!/usr/bin/env python3
 
+import logging
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from os.path import join as join_path
 
-from . import Terminalle, __version__, load_settings
-from .auto import auto, no_auto, xdg_config_home_path
-from .key import (
-    keybind_autodetect,
-    keybind_gnome,
-    keybind_kde,
-    no_keybind_autodetect,
-    no_keybind_gnome,
-    no_keybind_kde,
-)
+# Each subcommand imports only the modules it uses, within `main()`,
+# so that e.g. `terminalle auto` does not load GTK.
+# See `bench/imports.py`.
+from . import __version__
+from .auto import xdg_config_home_path
 
 
 def build_argparse() -> ArgumentParser:
@@ -34,6 +30,24 @@ def build_argparse() -> ArgumentParser:
         action='store_true',
         help='show the window immediately on startup',
     )
+    parser.add_argument(
+        '-d',
+        '--debug',
+        action='store_true',
+        help='log debugging information to stderr',
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='PATH',
+        help='write a Chrome trace of startup and the main loop to PATH on exit',
+    )
+    parser.add_argument(
+        '--trace-stall-ms',
+        metavar='MS',
+        type=float,
+        default=50,
+        help='trace main loop stalls longer than MS milliseconds',
+    )
 
     subparsers = parser.add_subparsers(
         title='subcommands',
@@ -68,6 +82,26 @@ def build_argparse() -> ArgumentParser:
         description='Remove any keyboard shortcuts'
         ' that were created using the `key` subcommand.',
     )
+    toggle_parser = subparsers.add_parser(
+        'toggle',
+        help='toggle window visibility',
+        description='Toggle the window visibility of the running server,'
+        ' starting it if necessary (see the `auto` subcommand).',
+    )
+    toggle_parser.add_argument(
+        '-m',
+        '--monitor',
+        metavar='NAME',
+        help='show the window on the monitor with this connector (e.g. DP-1),'
+        ' model or index, moving it there if it is visible on another one;'
+        ' the window is made fullscreen there,'
+        ' which some compositors draw without transparency',
+    )
+    subparsers.add_parser(
+        'quit',
+        help='shut down the server',
+        description='Close the window and shut down the running server.',
+    )
 
     for sub_parser in [auto_parser, no_auto_parser]:
         target_group = sub_parser.add_mutually_exclusive_group()
@@ -134,9 +168,52 @@ def build_argparse() -> ArgumentParser:
 
 def main():
     args = build_argparse().parse_args()
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
     if args.subcommand is None:
-        Terminalle(settings=load_settings(args.config), show=args.show).run()
+        from .instrument import mark, span
+
+        tracer = None
+        if args.trace is not None:
+            from .trace import Tracer
+
+            tracer = Tracer(args.trace_stall_ms)
+            tracer.start()
+        mark('main')
+        with span('imports'):
+            from . import Terminalle, load_settings
+        mark('imported')
+        with span('settings.load'):
+            settings = load_settings(args.config)
+        mark('settings-loaded')
+        terminalle = Terminalle(
+            settings=settings,
+            show=args.show,
+            config_path=args.config,
+        )
+        if tracer is None:
+            terminalle.run()
+            return
+        tracer.watch_main_loop()
+        try:
+            terminalle.run()
+        finally:
+            tracer.stop()
+            tracer.write(args.trace)
+    elif args.subcommand == 'toggle':
+        from .client import call
+
+        if args.monitor is None:
+            call('Toggle')
+        else:
+            call('ToggleOn', args.monitor)
+    elif args.subcommand == 'quit':
+        from .client import call
+
+        call('Quit')
     elif args.subcommand == 'auto':
+        from .auto import auto
+
         auto(
             args.system,
             args.force,
@@ -144,8 +221,12 @@ def main():
             not args.no_restart_if_closed,
         )
     elif args.subcommand == 'no-auto':
+        from .auto import no_auto
+
         no_auto(args.system, args.force)
     elif args.subcommand == 'key':
+        from .key import keybind_autodetect, keybind_gnome, keybind_kde
+
         if args.gnome:
             keybind = keybind_gnome
         elif args.kde:
@@ -154,6 +235,8 @@ def main():
             keybind = keybind_autodetect
         keybind(args.toggle, args.quit)
     elif args.subcommand == 'no-key':
+        from .key import no_keybind_autodetect, no_keybind_gnome, no_keybind_kde
+
         if args.gnome:
             no_keybind = no_keybind_gnome
         elif args.kde:
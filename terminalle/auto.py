@@ -7,7 +7,7 @@ from os.path import join as join_path
 from os.path import sep as path_sep
 from sys import stderr
 
-from .terminalle import SERVICE_NAME
+from .client import SERVICE_NAME
 
 # https://specifications.freedesktop.org/basedir-spec/basedir-spec-latest.html (for reference)
 # https://specifications.freedesktop.org/autostart-spec/autostart-spec-latest.html (auto-start)
@@ -0,0 +1,30 @@
+"""Minimal D-Bus client to invoke methods on a running server."""
+
+SERVICE_NAME = 'party.will.Terminalle'
+OBJECT_PATH = '/party/will/Terminalle'
+
+
+def call(method: str, *args: str):
+    """
+    Invoke a method (e.g. `Toggle`) with string arguments `args`
+    on the server without waiting for a reply.
+
+    The server is started by D-Bus activation if it's not already running
+    and the service file is installed (see `terminalle auto`).
+    """
+    # Import lazily, so that modules needing only the names above
+    # (e.g. `auto`) don't load GObject.
+    import gi
+
+    gi.require_version('Gio', '2.0')
+    from gi.repository import Gio, GLib
+
+    connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+    message = Gio.DBusMessage.new_method_call(
+        SERVICE_NAME, OBJECT_PATH, SERVICE_NAME, method
+    )
+    if args:
+        message.set_body(GLib.Variant(f'({"s" * len(args)})', args))
+    message.set_flags(Gio.DBusMessageFlags.NO_REPLY_EXPECTED)
+    connection.send_message(message, Gio.DBusSendMessageFlags.NONE)
+    connection.flush_sync(None)
@@ -0,0 +1,102 @@
+"""Streaming the terminal's contents to files, optionally compressed."""
+
+import gzip
+from os import open as os_open
+from shutil import copyfileobj
+from subprocess import PIPE, run
+from tempfile import TemporaryFile
+from threading import Thread
+from typing import BinaryIO, Callable, Optional
+
+import gi
+
+gi.require_version('Gio', '2.0')
+gi.require_version('Vte', '3.91')
+from gi.repository import Gio, GLib, Vte
+
+formats = {'text', 'gzip', 'zstd'}
+
+
+def guess_format(path: str) -> str:
+    """Return the format implied by the extension of `path`."""
+    if path.endswith('.gz'):
+        return 'gzip'
+    elif path.endswith('.zst'):
+        return 'zstd'
+    return 'text'
+
+
+def save_contents(
+    terminal: Vte.Terminal,
+    path: str,
+    format: str,
+    callback: Callable[[Optional[str]], None],
+):
+    """
+    Write the terminal's scrollback and screen as text to the file or FIFO at `path`,
+    compressed according to `format` (see `formats`),
+    then call `callback` on the main loop with an error message, or `None` on success.
+
+    VTE can only write its contents synchronously, on the main loop,
+    so it writes them to an anonymous temporary file
+    (in the temporary directory, like its own scrollback).
+    A worker thread then opens the destination (which blocks for a FIFO until it is read)
+    and copies or compresses the text into it,
+    so neither the destination nor compression block the main loop.
+    """
+    contents = None
+    try:
+        contents = TemporaryFile()
+        stream = Gio.UnixOutputStream.new(contents.fileno(), False)
+        terminal.write_contents_sync(stream, Vte.WriteFlags.DEFAULT, None)
+    except OSError as error:
+        callback(f'temporary file: {error.strerror}')
+    except GLib.Error as error:
+        callback(error.message)
+    else:
+        Thread(
+            target=_write,
+            args=(contents, path, format, callback),
+            name='terminalle-export',
+            daemon=True,
+        ).start()
+        return
+    if contents is not None:
+        contents.close()
+
+
+def _write(
+    contents: BinaryIO,
+    path: str,
+    format: str,
+    callback: Callable[[Optional[str]], None],
+):
+    """Copy or compress `contents` into `path` (worker thread)."""
+    error = None
+    try:
+        with contents, open(path, 'wb', opener=_open_private) as f:
+            contents.seek(0)
+            if format == 'zstd':
+                result = run(
+                    ['zstd', '-q', '-c'], stdin=contents, stdout=f, stderr=PIPE
+                )
+                if result.returncode != 0:
+                    message = result.stderr.decode(errors='replace').strip()
+                    error = f'zstd: {message or f"exit status {result.returncode}"}'
+            elif format == 'gzip':
+                with gzip.open(f, 'wb') as compressed:
+                    copyfileobj(contents, compressed)
+            else:
+                copyfileobj(contents, f)
+    except OSError as e:
+        error = f'{e.filename or path}: {e.strerror}'
+    GLib.idle_add(_report, callback, error)
+
+
+def _open_private(path: str, flags: int) -> int:
+    return os_open(path, flags, 0o600)
+
+
+def _report(callback: Callable[[Optional[str]], None], error: Optional[str]) -> bool:
+    callback(error)
+    return GLib.SOURCE_REMOVE
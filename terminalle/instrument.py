@@ -0,0 +1,65 @@
+"""
+Instrumentation hooks for timing phases of the application.
+
+Points of interest call `mark()` with a name (e.g. `activate`).
+Without any hooks installed, marks cost a single truthiness check.
+
+Spans of time are reported as a pair of marks named `<name>:begin` and `<name>:end`.
+Spans opened with `span()` nest within each other on the main thread.
+Spans of asynchronous operations, which may overlap with anything,
+are instead named `<name>:async-begin` and `<name>:async-end`.
+"""
+
+from contextlib import contextmanager
+from time import monotonic_ns
+from typing import Callable, Iterator, List
+
+# Each hook is called with the name of the mark
+# and the time it was reached (`time.monotonic_ns()`).
+_hooks: List[Callable[[str, int], None]] = []
+
+
+def add_hook(hook: Callable[[str, int], None]):
+    """Call `hook` for every subsequent mark."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[str, int], None]):
+    """Stop calling `hook` for marks."""
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    """Return whether any hooks are installed."""
+    return bool(_hooks)
+
+
+def mark(name: str):
+    """Report that the point of interest `name` has been reached."""
+    if _hooks:
+        time = monotonic_ns()
+        for hook in _hooks:
+            hook(name, time)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Report the time spent within a `with` block, or a decorated function.
+    Spans must be opened and closed on the main thread.
+    """
+    mark(f'{name}:begin')
+    try:
+        yield
+    finally:
+        mark(f'{name}:end')
+
+
+def begin_async(name: str):
+    """Report the start of an asynchronous operation."""
+    mark(f'{name}:async-begin')
+
+
+def end_async(name: str):
+    """Report the completion of an asynchronous operation started with `begin_async`."""
+    mark(f'{name}:async-end')
@@ -23,6 +23,8 @@ _gnome_custom_keybinding_path_regex = re.compile(
     r'/org/gnome/settings-daemon/plugins/media-keys/custom-keybindings/custom([0-9]+)/'
 )
 _gnome_shortcut_name = 'Toggle Terminalle'
+# `dbus-send` starts in a couple of milliseconds,
+# whereas the `terminalle` subcommands must first start a Python interpreter.
 _gnome_shortcut_command_template = (
     'dbus-send --session --type=method_call --dest=party.will.Terminalle'
     ' /party/will/Terminalle party.will.Terminalle.{}'
@@ -0,0 +1,109 @@
+"""Clickable links in plain output, recognized by regular expressions."""
+
+import logging
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+import gi
+
+gi.require_version('Vte', '3.91')
+from gi.repository import GLib, Vte
+
+_logger = logging.getLogger(__name__)
+
+# https://github.com/PCRE2Project/pcre2/blob/master/src/pcre2.h.in
+_PCRE2_MULTILINE = 0x00000400
+_PCRE2_UTF = 0x00080000
+_PCRE2_JIT_COMPLETE = 0x00000001
+_PCRE2_SUBSTITUTE_UNSET_EMPTY = 0x00000400
+
+# Delimits the expansion of a template; terminal text never contains control characters.
+_expansion_marker = '\x01'
+
+# A link's action (see the `links` setting), by the tag VTE gave its pattern.
+Actions = Dict[int, Tuple[Vte.Regex, str, object]]
+
+
+@lru_cache(maxsize=None)
+def compile_link(pattern: str) -> Vte.Regex:
+    """
+    Return the pattern compiled for VTE (with JIT compilation, where supported).
+    Raise `GLib.Error` if PCRE2 rejects the pattern.
+    """
+    regex = Vte.Regex.new_for_match(pattern, -1, _PCRE2_UTF | _PCRE2_MULTILINE)
+    try:
+        regex.jit(_PCRE2_JIT_COMPLETE)
+    except GLib.Error:
+        pass  # JIT compilation is unsupported, but matching still works
+    return regex
+
+
+def add_links(terminal: Vte.Terminal, links: List[tuple]) -> Actions:
+    """
+    Replace the patterns that the terminal highlights under the pointer
+    with those of the `links` setting, and return their actions by tag.
+
+    VTE only matches the patterns against the text around the pointer
+    when it moves (or the text under it changes),
+    so they cost nothing for output that is never hovered.
+    """
+    terminal.match_remove_all()
+    actions = {}
+    for pattern, kind, value in links:
+        try:
+            regex = compile_link(pattern)
+        except GLib.Error as error:
+            _logger.warning('Ignoring link pattern %s: %s', pattern, error.message)
+            continue
+        tag = terminal.match_add_regex(regex, 0)
+        terminal.match_set_cursor_name(tag, 'pointer')
+        actions[tag] = (regex, kind, value)
+    return actions
+
+
+def expand(regex: Vte.Regex, text: str, template: str, cwd: str) -> Optional[str]:
+    """
+    Return `template` with `{0}` replaced by the link's text,
+    `{1}` and so on (or `{name}`) by its groups,
+    and `{cwd}` by the terminal's working directory.
+    Return `None` if the template doesn't fit the pattern.
+
+    Groups are extracted by PCRE2 itself, through substitution,
+    so that they are consistent with the matching.
+    """
+    try:
+        replacement = _replacement(template, cwd)
+        expanded = regex.substitute(
+            text,
+            f'{_expansion_marker}{replacement}{_expansion_marker}',
+            _PCRE2_SUBSTITUTE_UNSET_EMPTY,
+        )
+    except ValueError as error:
+        _logger.warning('Invalid link template %s: %s', template, error)
+        return None
+    except GLib.Error as error:
+        _logger.warning('Invalid link template %s: %s', template, error.message)
+        return None
+    parts = expanded.split(_expansion_marker)
+    return parts[1] if len(parts) == 3 else None
+
+
+def _replacement(template: str, cwd: str) -> str:
+    """
+    Translate a template in the syntax of `str.format()`
+    into a PCRE2 replacement string.
+    Raise `ValueError` if the template is malformed.
+    """
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        parts.append(literal.replace('$', '$$'))
+        if field is None:
+            continue
+        if not field or spec or conversion:
+            raise ValueError(f'unsupported replacement field {{{field}}}')
+        if field == 'cwd':
+            parts.append(cwd.replace('$', '$$'))
+        else:
+            parts.append(f'${{{field}}}')
+    return ''.join(parts)
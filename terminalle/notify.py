@@ -0,0 +1,139 @@
+"""Desktop notifications about activity in the hidden terminal."""
+
+from time import monotonic_ns
+
+import gi
+
+gi.require_version('Gio', '2.0')
+gi.require_version('Vte', '3.91')
+from gi.repository import Gio, GLib, GObject, Vte
+
+# Identifies Terminalle's notification, so that each replaces the last.
+notification_id = 'activity'
+
+# How long output must stop for before notifying about it.
+_quiet_ms = 2000
+
+# The least time between notifications; more frequent ones are coalesced.
+_interval_ms = 5000
+
+# Set by shell integration (OSC 133) when a command finishes, in VTE >= 0.78.
+_command_finished_termprop = 'vte.shell.postexec'
+
+
+class Notifier:
+    """
+    Watches a terminal while it is hidden, and raises a desktop notification
+    when a command finishes (with shell integration), the bell rings,
+    or output arrives and then settles.
+
+    Output costs almost nothing to watch:
+    each change only records the time until the debounce timeout checks it,
+    and after the first notification about output, it is no longer watched.
+    """
+
+    def __init__(self, app: Gio.Application, action: str):
+        """Notifications activate the application action `action` when clicked."""
+        self.app = app
+        self.action = action
+        self.watching = False
+        self._terminal = None
+        self._handlers = []
+        self._output_handler = None
+        # When output last arrived, and the timeout waiting for it to settle.
+        self._last_output = 0
+        self._quiet_source = None
+        # When the last notification was sent, and one waiting for its turn.
+        self._last_sent = None
+        self._pending = None
+        self._pending_source = None
+
+    def watch(self, terminal: Vte.Terminal):
+        """Start watching `terminal`."""
+        self.unwatch(withdraw=False)
+        self.watching = True
+        self._terminal = terminal
+        self._handlers.append(terminal.connect('bell', self._on_bell))
+        if GObject.signal_lookup('termprop-changed', Vte.Terminal):
+            self._handlers.append(
+                terminal.connect('termprop-changed', self._on_termprop_changed)
+            )
+        self._output_handler = terminal.connect('contents-changed', self._on_output)
+
+    def unwatch(self, withdraw: bool = True):
+        """Stop watching, e.g. once the terminal is shown, withdrawing any notification."""
+        self.watching = False
+        if self._terminal is not None:
+            for handler in self._handlers:
+                self._terminal.disconnect(handler)
+            self._stop_watching_output()
+            self._terminal = None
+        self._handlers = []
+        if self._quiet_source is not None:
+            GLib.source_remove(self._quiet_source)
+            self._quiet_source = None
+        if withdraw:
+            if self._pending_source is not None:
+                GLib.source_remove(self._pending_source)
+                self._pending_source = None
+            self._pending = None
+            self.app.withdraw_notification(notification_id)
+
+    def _stop_watching_output(self):
+        if self._output_handler is not None:
+            self._terminal.disconnect(self._output_handler)
+            self._output_handler = None
+
+    def _on_bell(self, terminal: Vte.Terminal):
+        self._notify('The bell rang in the terminal.')
+
+    def _on_termprop_changed(self, terminal: Vte.Terminal, name: str):
+        if name == _command_finished_termprop:
+            self._notify('A command finished in the terminal.')
+
+    def _on_output(self, terminal: Vte.Terminal):
+        self._last_output = monotonic_ns()
+        if self._quiet_source is None:
+            self._quiet_source = GLib.timeout_add(
+                _quiet_ms, self._on_quiet, priority=GLib.PRIORITY_LOW
+            )
+
+    def _on_quiet(self) -> bool:
+        """Notify about output once it has settled, then stop watching it."""
+        remaining_ms = _quiet_ms - (monotonic_ns() - self._last_output) // 1_000_000
+        if remaining_ms > 0:
+            self._quiet_source = GLib.timeout_add(
+                remaining_ms, self._on_quiet, priority=GLib.PRIORITY_LOW
+            )
+            return GLib.SOURCE_REMOVE
+        self._quiet_source = None
+        self._stop_watching_output()
+        self._notify('There is new output in the terminal.')
+        return GLib.SOURCE_REMOVE
+
+    def _notify(self, body: str):
+        """Send a notification, or hold it until the last one is old enough."""
+        now = monotonic_ns()
+        if self._last_sent is not None:
+            wait_ms = _interval_ms - (now - self._last_sent) // 1_000_000
+            if wait_ms > 0:
+                # Only the latest held notification is sent.
+                self._pending = body
+                if self._pending_source is None:
+                    self._pending_source = GLib.timeout_add(wait_ms, self._send_pending)
+                return
+        self._send(body)
+
+    def _send_pending(self) -> bool:
+        self._pending_source = None
+        if self._pending is not None:
+            self._send(self._pending)
+            self._pending = None
+        return GLib.SOURCE_REMOVE
+
+    def _send(self, body: str):
+        notification = Gio.Notification.new('Terminalle')
+        notification.set_body(body)
+        notification.set_default_action(f'app.{self.action}')
+        self.app.send_notification(notification_id, notification)
+        self._last_sent = monotonic_ns()
@@ -0,0 +1,110 @@
+"""Pasting large amounts of text without blocking the main loop."""
+
+from codecs import getincrementaldecoder
+from typing import Callable, Optional
+
+import gi
+
+gi.require_version('Gio', '2.0')
+gi.require_version('Vte', '3.91')
+from gi.repository import Gio, GLib, Vte
+
+# Clipboard formats to request, in order of preference.
+mime_types = ['text/plain;charset=utf-8', 'text/plain']
+
+# How much to read from the clipboard and write to the PTY at a time.
+chunk_size = 64 * 1024
+
+
+class Paster:
+    """
+    Pastes a stream of UTF-8 text into a terminal in bounded chunks,
+    only as fast as its PTY accepts them.
+
+    Each chunk goes through `Vte.Terminal.paste_text()`,
+    which converts newlines and adds bracketed paste markers
+    if the application has asked for them.
+    VTE doesn't expose whether it has,
+    so a long paste arrives as several consecutive bracketed pastes.
+    A carriage return at the end of a chunk is held back until the next one,
+    so that a CRLF split between chunks still becomes a single newline.
+    """
+
+    def __init__(
+        self,
+        terminal: Vte.Terminal,
+        stream: Gio.InputStream,
+        on_progress: Callable[[int], None],
+        on_done: Callable[[Optional[str]], None],
+    ):
+        """
+        Call `on_progress` with the number of bytes pasted so far after each chunk,
+        and `on_done` with an error message, or `None` once everything was pasted.
+        """
+        self._terminal = terminal
+        self._stream = stream
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._decoder = getincrementaldecoder('utf-8')(errors='replace')
+        self._carriage_return = ''
+        self._cancellable = Gio.Cancellable()
+        self._watch = None
+        self.pasted = 0
+
+    def start(self):
+        self._read()
+
+    def cancel(self):
+        """Stop pasting, without calling `on_done`."""
+        self._cancellable.cancel()
+        if self._watch is not None:
+            GLib.source_remove(self._watch)
+            self._watch = None
+
+    def _read(self):
+        self._stream.read_bytes_async(
+            chunk_size, GLib.PRIORITY_DEFAULT, self._cancellable, self._on_read
+        )
+
+    def _on_read(self, stream: Gio.InputStream, result: Gio.AsyncResult):
+        if self._cancellable.is_cancelled():
+            return
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as error:
+            self._on_done(error.message)
+            return
+        if not data:
+            text = self._carriage_return + self._decoder.decode(b'', final=True)
+            if text:
+                self._terminal.paste_text(text)
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            self._on_done(None)
+            return
+        text = self._carriage_return + self._decoder.decode(data)
+        self._carriage_return = ''
+        if text.endswith('\r'):
+            text, self._carriage_return = text[:-1], '\r'
+        if text:
+            self._terminal.paste_text(text)
+        self.pasted += len(data)
+        self._on_progress(self.pasted)
+        # Wait until the PTY can take more, letting input and redraws run first.
+        pty = self._terminal.get_pty()
+        if pty is None:
+            self._on_done('the terminal has no PTY')
+            return
+        self._watch = GLib.io_add_watch(
+            pty.get_fd(),
+            GLib.PRIORITY_DEFAULT_IDLE,
+            GLib.IOCondition.OUT | GLib.IOCondition.ERR | GLib.IOCondition.HUP,
+            self._on_writable,
+        )
+
+    def _on_writable(self, fd: int, condition: GLib.IOCondition) -> bool:
+        self._watch = None
+        if condition & (GLib.IOCondition.ERR | GLib.IOCondition.HUP):
+            self._on_done('the PTY was closed')
+        else:
+            self._read()
+        return GLib.SOURCE_REMOVE
@@ -0,0 +1,224 @@
+"""Incremental regular expression search over the terminal's scrollback."""
+
+from functools import lru_cache
+from typing import Callable, Iterator, Tuple
+
+import gi
+
+gi.require_version('Vte', '3.91')
+from gi.repository import GLib, Vte
+
+# https://github.com/PCRE2Project/pcre2/blob/master/src/pcre2.h.in
+_PCRE2_CASELESS = 0x00000008
+_PCRE2_MULTILINE = 0x00000400
+_PCRE2_UTF = 0x00080000
+_PCRE2_LITERAL = 0x02000000
+_PCRE2_JIT_COMPLETE = 0x00000001
+_PCRE2_NOTEMPTY = 0x00000004
+
+# Replaces a match while scanning; terminal text never contains control characters.
+_match_marker = '\x01'
+
+# How many rows to scan per main loop iteration.
+_rows_per_step = 2000
+
+# Search flags, each a single character.
+flag_descriptions = {
+    'i': 'ignore case',
+    'l': 'match the pattern literally rather than as a regular expression',
+}
+
+
+class InvalidPatternError(ValueError):
+    """Indicates that a search pattern or its flags are invalid."""
+
+    pass
+
+
+@lru_cache(maxsize=32)
+def compile_pattern(pattern: str, flags: str) -> Vte.Regex:
+    """Return the pattern compiled for VTE (with JIT compilation, where supported)."""
+    unknown = set(flags) - set(flag_descriptions)
+    if unknown:
+        raise InvalidPatternError(f'unknown search flags {sorted(unknown)}')
+    pcre2_flags = _PCRE2_UTF | _PCRE2_MULTILINE
+    if 'i' in flags:
+        pcre2_flags |= _PCRE2_CASELESS
+    if 'l' in flags:
+        pcre2_flags |= _PCRE2_LITERAL
+    try:
+        regex = Vte.Regex.new_for_search(pattern, -1, pcre2_flags)
+    except GLib.Error as error:
+        raise InvalidPatternError(f'invalid pattern ({pattern}): {error.message}')
+    try:
+        regex.jit(_PCRE2_JIT_COMPLETE)
+    except GLib.Error:
+        pass  # JIT compilation is unsupported, but matching still works
+    return regex
+
+
+def _matches(regex: Vte.Regex, line: str) -> bool:
+    """
+    Return whether `regex` matches (a non-empty part of) `line`,
+    with PCRE2 like VTE's own search.
+    """
+    # VTE only exposes matching through substitution.
+    return _match_marker in regex.substitute(line, _match_marker, _PCRE2_NOTEMPTY)
+
+
+class Search:
+    """
+    Finds matches of a pattern in a terminal's buffer, one logical line at a time,
+    like `Vte.Terminal.search_find_next()`.
+
+    VTE searches synchronously, which can freeze the main loop
+    for a distant match (or none) in a long scrollback.
+    So the buffer is first scanned in small steps during idle time,
+    with the same PCRE2 regex that VTE uses,
+    and VTE is only asked to select a match once it is known to be close.
+    """
+
+    def __init__(self, terminal: Vte.Terminal, pattern: str, flags: str = ''):
+        """Raise `InvalidPatternError` if the pattern or flags are invalid."""
+        self.terminal = terminal
+        self.pattern = pattern
+        self.flags = flags
+        self._regex = compile_pattern(pattern, flags)
+        terminal.search_set_regex(self._regex, 0)
+        terminal.search_set_wrap_around(True)
+        # The selected match, as the first row of the chunk it was found in
+        # and the index of its line within that chunk.
+        self._match = None
+        # The scan in progress, and its callback.
+        self._source = None
+        self._callback = None
+
+    def cancel(self):
+        """Stop any search in progress, and clear the selected match."""
+        self._stop()
+        self._match = None
+        self.terminal.unselect_all()
+
+    def _stop(self):
+        """Stop the scan in progress, if any, reporting no match to its caller."""
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+            self._callback(False)
+
+    def find(self, backward: bool, callback: Callable[[bool], None]):
+        """
+        Select the next (or previous) match, wrapping around the buffer,
+        then call `callback` with whether there was one.
+        A search still in progress is superseded, as if it found nothing.
+        """
+        self._stop()
+        steps = self._scan(backward)
+
+        def _step() -> bool:
+            found = next(steps)
+            if found is None:
+                return GLib.SOURCE_CONTINUE
+            self._source = None
+            if found is not False:
+                self._select(backward, *found)
+            callback(found is not False)
+            return GLib.SOURCE_REMOVE
+
+        self._callback = callback
+        self._source = GLib.idle_add(_step, priority=GLib.PRIORITY_LOW)
+
+    def _rows(self) -> Tuple[int, int]:
+        adjustment = self.terminal.get_vadjustment()
+        return int(adjustment.get_lower()), int(adjustment.get_upper())
+
+    def _lines(self, start: int, end: int) -> list:
+        """Return the logical lines in rows `[start, end)`."""
+        if start >= end:
+            return []
+        text, _ = self.terminal.get_text_range_format(
+            Vte.Format.TEXT, start, 0, end - 1, self.terminal.get_column_count()
+        )
+        lines = (text or '').split('\n')
+        if lines and lines[-1] == '':
+            lines.pop()
+        return lines
+
+    def _chunk(self, row: int) -> Tuple[int, int]:
+        """Return the rows of the chunk containing `row`, aligned to a step."""
+        lower, upper = self._rows()
+        start = lower + (row - lower) // _rows_per_step * _rows_per_step
+        return start, min(upper, start + _rows_per_step)
+
+    def _scan(self, backward: bool) -> Iterator[object]:
+        """
+        Yield `None` after each step of scanning,
+        then `(chunk_start, line_index)` for the next match, or `False` for none.
+        """
+        lower, upper = self._rows()
+        if self._match is not None:
+            start, index = self._match
+            index += -1 if backward else 1
+        else:
+            adjustment = self.terminal.get_vadjustment()
+            top = int(adjustment.get_value())
+            row = top + self.terminal.get_row_count() - 1 if backward else top
+            start = self._chunk(min(max(row, lower), upper - 1))[0]
+            index = None
+        # Come back around to the start of the first chunk.
+        chunks = -(-(upper - lower) // _rows_per_step)
+        for _ in range(chunks + 1):
+            start, end = self._chunk(start)
+            lines = self._lines(start, end)
+            if backward:
+                index = len(lines) - 1 if index is None else min(index, len(lines) - 1)
+                indices = range(index, -1, -1)
+            else:
+                indices = range(index or 0, len(lines))
+            for i in indices:
+                if _matches(self._regex, lines[i]):
+                    yield start, i
+                    return
+            index = None
+            if backward:
+                start = start - _rows_per_step if start > lower else upper - 1
+            else:
+                start = end if end < upper else lower
+            yield None
+        yield False
+
+    def _select(self, backward: bool, start: int, index: int):
+        """Have VTE select the match at line `index` of the chunk at row `start`."""
+        current = self._match
+        self._match = (start, index)
+        if current is not None and current[0] == start:
+            # VTE continues from the current match, within this chunk.
+            if backward:
+                self.terminal.search_find_previous()
+            else:
+                self.terminal.search_find_next()
+            return
+        end = self._chunk(start)[1]
+        lines = self._lines(start, end)
+        adjustment = self.terminal.get_vadjustment()
+        page = self.terminal.get_row_count()
+        self.terminal.unselect_all()
+        if backward:
+            # VTE searches backward from the bottom of the visible rows.
+            adjustment.set_value(end - page)
+            bottom = int(adjustment.get_value()) + page
+            skipped = self._count(lines[index + 1 :]) + self._count(
+                self._lines(end, bottom)
+            )
+            for _ in range(skipped + 1):
+                self.terminal.search_find_previous()
+        else:
+            # VTE searches forward from the top of the visible rows.
+            adjustment.set_value(start)
+            top = int(adjustment.get_value())
+            skipped = self._count(self._lines(top, start)) + self._count(lines[:index])
+            for _ in range(skipped + 1):
+                self.terminal.search_find_next()
+
+    def _count(self, lines: list) -> int:
+        return sum(1 for line in lines if _matches(self._regex, line))
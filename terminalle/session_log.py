@@ -0,0 +1,231 @@
+"""Recording the terminal's output to rotating, compressed log files."""
+
+import gzip
+import logging
+from os import makedirs
+from os.path import exists
+from os.path import join as join_path
+from queue import Empty, Full, Queue
+from subprocess import DEVNULL, PIPE, Popen
+from threading import Thread
+from time import monotonic, strftime
+from typing import BinaryIO, Optional
+
+import gi
+
+gi.require_version('Vte', '3.91')
+from gi.repository import GLib, Vte
+
+_logger = logging.getLogger(__name__)
+
+_extensions = {'text': '.txt', 'gzip': '.txt.gz', 'zstd': '.txt.zst'}
+
+# How long to let output accumulate before reading it back from the terminal.
+_flush_ms = 200
+
+# How many chunks of text may wait for the writer before new ones are dropped.
+_queue_chunks = 256
+
+
+class SessionLog:
+    """
+    Records the output of a terminal, as text,
+    to files under `directory` that rotate by size and age.
+
+    VTE doesn't expose the raw output,
+    so lines are read back from the terminal once the cursor has moved past them,
+    batching output that arrives within `_flush_ms`.
+    (Full-screen programs that redraw in place are only partially recorded,
+    and nothing is recorded from the alternate screen, e.g. of vim or tmux.)
+    The main loop only hands the text to a bounded queue;
+    compression and file I/O happen on a worker thread.
+    If the writer falls behind, text is dropped rather than blocking the main loop.
+    """
+
+    def __init__(
+        self, directory: str, format: str, rotate_bytes: int, rotate_seconds: int
+    ):
+        self.directory = directory
+        self.format = format
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        # Bytes of text dropped because the writer fell behind
+        # (or the terminal discarded lines before they were read).
+        self.dropped = 0
+        self._queue = Queue(maxsize=_queue_chunks)
+        # Set once closed, for the writer to stop when the queue is empty
+        # in case it was too full to take the end-of-queue marker.
+        self._closed = False
+        self._thread = Thread(
+            target=self._write, name='terminalle-session-log', daemon=True
+        )
+        self._thread.start()
+        self._terminal = None
+        self._handler = None
+        self._source = None
+        # The first row of the normal screen not yet recorded.
+        self._row = 0
+        # The end of the normal screen's rows when last seen.
+        self._upper = 0
+
+    def attach(self, terminal: Vte.Terminal):
+        """Start recording output that arrives in `terminal` from now on."""
+        self.detach()
+        self._terminal = terminal
+        self._row = terminal.get_cursor_position()[1]
+        self._upper = int(terminal.get_vadjustment().get_upper())
+        self._handler = terminal.connect('contents-changed', self._on_contents_changed)
+
+    def detach(self):
+        """Record what remains of the current terminal's output, and stop watching it."""
+        if self._terminal is None:
+            return
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        self._flush()
+        self._terminal.disconnect(self._handler)
+        self._terminal = None
+        self._handler = None
+
+    def close(self):
+        """
+        Stop recording, without waiting for the writer
+        to finish writing what has been queued (see `join()`).
+        """
+        self.detach()
+        self._closed = True
+        try:
+            self._queue.put_nowait(None)
+        except Full:
+            pass
+
+    def join(self, timeout: float):
+        """Wait up to `timeout` seconds for the writer to finish, once closed."""
+        self._thread.join(timeout)
+
+    def _on_contents_changed(self, terminal: Vte.Terminal):
+        if self._source is None:
+            self._source = GLib.timeout_add(
+                _flush_ms, self._flush, priority=GLib.PRIORITY_LOW
+            )
+
+    def _flush(self) -> bool:
+        """Queue the rows that the cursor has moved past since the last flush."""
+        self._source = None
+        terminal = self._terminal
+        adjustment = terminal.get_vadjustment()
+        first, upper = int(adjustment.get_lower()), int(adjustment.get_upper())
+        if upper < self._upper and upper - first <= terminal.get_row_count():
+            # The alternate screen is active.
+            # Its rows are numbered separately from the normal screen's,
+            # whose rows never decrease (unless the terminal is reset),
+            # and it has no scrollback.
+            # Keep the normal screen's position until it returns.
+            return GLib.SOURCE_REMOVE
+        self._upper = upper
+        row = terminal.get_cursor_position()[1]
+        if row < self._row:
+            # The terminal was reset, or the cursor moved up to redraw.
+            self._row = row
+            return GLib.SOURCE_REMOVE
+        if self._row < first:
+            # Rows that scrolled out of the scrollback before they were read.
+            self.dropped += (first - self._row) * terminal.get_column_count()
+            self._row = first
+        if row > self._row:
+            text, _ = terminal.get_text_range_format(
+                Vte.Format.TEXT, self._row, 0, row - 1, terminal.get_column_count()
+            )
+            self._row = row
+            if text:
+                data = text.encode()
+                try:
+                    self._queue.put_nowait(data)
+                except Full:
+                    self.dropped += len(data)
+        return GLib.SOURCE_REMOVE
+
+    def _write(self):
+        """Compress and write queued text, rotating files as needed (worker thread)."""
+        file = None
+        written = 0
+        opened = 0.0
+        while True:
+            try:
+                data = self._queue.get(timeout=self.rotate_seconds)
+            except Empty:
+                data = b''
+            if data is None:
+                break
+            if file is not None and (
+                written >= self.rotate_bytes
+                or monotonic() - opened >= self.rotate_seconds
+            ):
+                _close(file)
+                file = None
+            if not data:
+                if self._closed and self._queue.empty():
+                    break
+                continue
+            if file is None:
+                file = self._open()
+                written = 0
+                opened = monotonic()
+                if file is None:
+                    continue
+            try:
+                file.write(data)
+            except OSError as error:
+                _logger.warning('Failed to write the session log: %s', error)
+                _close(file)
+                file = None
+                continue
+            written += len(data)
+            if self._closed and self._queue.empty():
+                break
+        if file is not None:
+            _close(file)
+
+    def _open(self) -> Optional[BinaryIO]:
+        base = join_path(self.directory, strftime('terminalle-%Y%m%d-%H%M%S'))
+        extension = _extensions[self.format]
+        path = f'{base}{extension}'
+        index = 1
+        while exists(path):
+            path = f'{base}-{index}{extension}'
+            index += 1
+        try:
+            makedirs(self.directory, mode=0o700, exist_ok=True)
+            if self.format == 'gzip':
+                return gzip.open(path, 'wb', compresslevel=6)
+            elif self.format == 'zstd':
+                return _ZstdFile(path)
+            return open(path, 'wb')
+        except OSError as error:
+            _logger.warning('Failed to open the session log %s: %s', path, error)
+            return None
+
+
+class _ZstdFile:
+    """A file written through the `zstd` command."""
+
+    def __init__(self, path: str):
+        with open(path, 'wb') as f:
+            self._process = Popen(
+                ['zstd', '-q', '-c'], stdin=PIPE, stdout=f, stderr=DEVNULL
+            )
+
+    def write(self, data: bytes):
+        self._process.stdin.write(data)
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+
+def _close(file: BinaryIO):
+    try:
+        file.close()
+    except OSError as error:
+        _logger.warning('Failed to close the session log: %s', error)
@@ -1,16 +1,44 @@
 """Loading and validating settings configurations."""
 
-from os import getcwd, getenv
-from os.path import expandvars
+import marshal
+from hashlib import sha256
+from os import getcwd, getenv, makedirs, replace, stat
+from os.path import abspath, expandvars
+from os.path import join as join_path
+from re import compile as re_compile
+from shlex import split as shlex_split
+from typing import Optional, Set, Tuple
 
-from gi.repository import Gdk, Pango
-from yaml import safe_load
+import gi
+
+gi.require_version('Gdk', '4.0')
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gdk, GLib, Gtk, Pango
+from yaml import load as yaml_load
+
+from .links import compile_link
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Variable references, as substituted by `expandvars()`.
+_variable_pattern = re_compile(r'\$(\w+|\{[^}]*\})')
+
+_cache_dir_path = join_path(
+    getenv('XDG_CACHE_HOME', join_path(getenv('HOME', '~'), '.cache')), 'terminalle'
+)
 
 _defaults = {
     # (string) path to shell binary e.g. `${HOME}/bash`
     'shell': getenv('SHELL', '/bin/sh'),
     # (string) initial home directory e.g. `${HOME}` or `/tmp`
     'home': getcwd(),
+    # (int) number of shells to spawn ahead of time;
+    # when the shell exits, one of them takes its place instead of quitting,
+    # as it does for a `new-session` shortcut or the `NewSession` D-Bus method
+    'shell_pool': 0,
     # (string) must be valid input for `Pango.font_description_from_string()`
     'font': 'monospace 13',
     # (array) must have length either 8, 16, 232, or 256:
@@ -47,34 +75,224 @@ _defaults = {
     ],
     # (number) window opacity beween 0.0 and 1.0 or 0 and 100
     'opacity': 0.75,
+    # (string) monitor to show the window on, by connector (e.g. `DP-1`),
+    # model or index, or null to maximize it wherever the desktop puts it;
+    # the window is made fullscreen on the monitor, which some compositors
+    # draw without transparency
+    'monitor': None,
     # (bool) whether to automatically hide the window when it loses keyboard focus
     'autohide': True,
     # (bool) whether to enable recommended hardwired tmux shortcuts
     'tmux': False,
+    # (int) number of lines of scrollback to keep, or -1 for unlimited
+    # VTE compresses scrollback and stores it in unlinked temporary files
+    'scrollback_lines': 10000,
+    # (string) where the `save-scrollback` shortcut action saves the scrollback,
+    # after formatting with `time.strftime()`;
+    # compressed with gzip or zstd if the name ends with `.gz` or `.zst`
+    'scrollback_path': '${HOME}/terminalle-%Y%m%d-%H%M%S.txt',
+    # (int) megabytes of temporary file storage that scrollback may use
+    # before the oldest lines are dropped, or null for no limit
+    # (the temporary directory is often in memory, e.g. with tmpfs)
+    'scrollback_memory_budget': None,
+    # (bool) whether to prepare the initially hidden window in the background,
+    # loading fonts and rendering resources, so that it shows quickly the first time
+    'prewarm': False,
+    # (int) seconds after which to destroy the hidden window to save memory,
+    # keeping the terminal's contents and the shell running,
+    # or null to always keep the window
+    'release_window_after': None,
+    # (bool) whether to raise desktop notifications while the window is hidden,
+    # when a command finishes (with shell integration), the bell rings,
+    # or new output settles
+    'notify': False,
+    # (string) directory in which to record the terminal's output as text,
+    # or null to not record it
+    'log_directory': None,
+    # (string) how to compress the recorded output: `text`, `gzip` or `zstd`
+    # (which requires the `zstd` command)
+    'log_format': 'gzip',
+    # (int) megabytes of text after which to start a new log file
+    'log_rotate_size': 64,
+    # (int) seconds after which to start a new log file
+    'log_rotate_age': 86400,
+    # (bool) whether to collect runtime statistics
+    # and expose them via the `party.will.Terminalle.Stats` D-Bus interface
+    'stats': False,
+    # (array) patterns that make plain text clickable with Ctrl+click,
+    # besides explicit (OSC 8) hyperlinks; each is a mapping with:
+    # - `pattern`: a PCRE2 regular expression, matched within a line
+    # - `open`: the URI to open, where `{0}` is the matched text,
+    #   `{1}` and so on (or `{name}` for `(?<name>...)`) are its groups,
+    #   and `{cwd}` is the shell's working directory (default: `{0}`)
+    # - or `run`: a command to launch instead (a string or a list of arguments),
+    #   with the same substitutions in each argument
+    'links': [
+        {'pattern': r'\b(?:https?|ftp)://[^\s<>"\'`]*[^\s<>"\'`.,:;!?)\]}]'},
+    ],
+    # (mapping) keyboard shortcuts, merged with these defaults
+    # and taking precedence over tmux mode shortcuts
+    # each key is a valid string for Gtk.accelerator_parse() e.g. `<Control><Shift>c`
+    # each value is one of:
+    # - the name of an internal action (see `_shortcut_actions`)
+    # - `{send: <string>}` to write the string to the terminal's PTY
+    # - `{run: <command>}` to launch a command (a string or a list of arguments)
+    # - `{tmux: <command>}` to run a tmux command (a string or a list of arguments)
+    # - `null` to disable a default shortcut
+    'shortcuts': {
+        '<Control><Shift>c': 'copy-clipboard',
+        '<Control><Shift>v': 'paste-clipboard',
+        '<Control><Shift>f': 'search',
+    },
 }
 _valid_colors_lengths = {8, 16, 232, 256}
+_log_formats = {'text', 'gzip', 'zstd'}
+_shortcut_actions = {
+    'copy-clipboard',
+    'paste-clipboard',
+    'toggle',
+    'new-session',
+    'save-scrollback',
+    'search',
+    'quit',
+}
+_shortcut_kinds = {'send', 'run', 'tmux'}
 
 
-def load(path: str):
-    """Return normalized settings loaded from a YAML file."""
+def load(path: str, cache: bool = True, strict: bool = False):
+    """
+    Return normalized settings loaded from a YAML file.
+
+    Unless `cache` is false, normalized settings are cached in a compact binary form
+    keyed on the file's path, modification time and size,
+    so an unchanged file is neither parsed nor validated again.
+
+    If the file cannot be read or parsed, return the default settings,
+    or if `strict` is true, raise `InvalidSettingsError`
+    (e.g. when reloading a file that is being saved or replaced).
+    """
+    key = _cache_key(path) if cache else None
+    if key is not None:
+        settings = _read_cache(key)
+        if settings is not None:
+            return settings
+    settings = _load(path, strict)
+    if key is not None:
+        _write_cache(key, settings)
+    return settings
+
+
+def _load(path: str, strict: bool):
     try:
         with open(path) as f:
-            attrs = safe_load(f)
-        assert isinstance(attrs, dict)
-    except Exception:
+            attrs = yaml_load(f, Loader=SafeLoader)
+        if not isinstance(attrs, dict):
+            raise InvalidSettingsError('the file must contain a mapping')
+    except Exception as error:
+        if strict:
+            raise InvalidSettingsError(f'failed to load: {error}') from error
         return _normalize()
     # change hyphenated-keys to underscored_keys
     return _normalize(**{key.replace('-', '_'): value for key, value in attrs.items()})
 
 
+def _cache_key(path: str) -> Optional[tuple]:
+    """
+    Return the key identifying the normalized settings for the file at `path`,
+    or `None` if the file cannot be cached.
+
+    Besides the file itself, normalization depends on this module
+    (which changes when Terminalle is upgraded)
+    and on the parts of the environment it reads:
+    the working directory and `SHELL` and `HOME` (for defaults),
+    and any variables the file refers to (for variable expansion).
+    Variables that change with every login (e.g. `XDG_SESSION_ID`)
+    don't invalidate the cache unless the file refers to them.
+    """
+    try:
+        config = stat(path)
+        module = stat(__file__)
+        with open(path) as f:
+            names = {name.strip('{}') for name in _variable_pattern.findall(f.read())}
+        environment = repr(
+            (
+                getcwd(),
+                [(name, getenv(name)) for name in sorted({'SHELL', 'HOME', *names})],
+            )
+        )
+    except (OSError, UnicodeDecodeError):
+        return None
+    return (
+        abspath(path),
+        config.st_mtime_ns,
+        config.st_size,
+        module.st_mtime_ns,
+        module.st_size,
+        sha256(environment.encode()).hexdigest(),
+    )
+
+
+def _cache_path(key: tuple) -> str:
+    name = sha256(key[0].encode()).hexdigest()[:16]
+    return join_path(_cache_dir_path, f'settings-{name}.cache')
+
+
+def _read_cache(key: tuple) -> Optional[dict]:
+    try:
+        with open(_cache_path(key), 'rb') as f:
+            cached_key, data = marshal.load(f)
+    except Exception:
+        return None
+    if cached_key != key:
+        return None
+    # Rebuild the GDK/Pango objects from their already-validated components.
+    return {
+        **data,
+        'font': Pango.font_description_from_string(data['font']),
+        'colors': [Gdk.RGBA(*color) for color in data['colors']],
+    }
+
+
+def _write_cache(key: tuple, settings: dict):
+    data = {
+        **settings,
+        'font': settings['font'].to_string(),
+        'colors': [(c.red, c.green, c.blue, c.alpha) for c in settings['colors']],
+    }
+    path = _cache_path(key)
+    try:
+        makedirs(_cache_dir_path, mode=0o700, exist_ok=True)
+        # Write atomically in case another instance is reading the cache.
+        with open(f'{path}.tmp', 'wb') as f:
+            marshal.dump((key, data), f)
+        replace(f'{path}.tmp', path)
+    except OSError:
+        pass
+
+
 def _normalize(
     shell: str = _defaults['shell'],
     home: str = _defaults['home'],
+    shell_pool: int = _defaults['shell_pool'],
     font: str = _defaults['font'],
     colors: list = _defaults['colors'],
     opacity: float = _defaults['opacity'],
+    monitor: Optional[str] = _defaults['monitor'],
     autohide: bool = _defaults['autohide'],
     tmux: bool = _defaults['tmux'],
+    scrollback_lines: int = _defaults['scrollback_lines'],
+    scrollback_path: str = _defaults['scrollback_path'],
+    scrollback_memory_budget: Optional[int] = _defaults['scrollback_memory_budget'],
+    prewarm: bool = _defaults['prewarm'],
+    release_window_after: Optional[int] = _defaults['release_window_after'],
+    notify: bool = _defaults['notify'],
+    log_directory: Optional[str] = _defaults['log_directory'],
+    log_format: str = _defaults['log_format'],
+    log_rotate_size: int = _defaults['log_rotate_size'],
+    log_rotate_age: int = _defaults['log_rotate_age'],
+    stats: bool = _defaults['stats'],
+    links: list = _defaults['links'],
+    shortcuts: dict = _defaults['shortcuts'],
     **kwargs,
 ):
     """
@@ -90,17 +308,144 @@ def _normalize(
     _opacity = _normalize_number(opacity, 100)
     if _opacity is None:
         raise InvalidSettingsError(f'opacity ({opacity}) must be a percentage number')
+    _budget = scrollback_memory_budget
+    if _budget is not None:
+        _budget = _normalize_int(_budget, 1, 'scrollback-memory-budget')
+    _release_after = release_window_after
+    if _release_after is not None:
+        _release_after = _normalize_int(_release_after, 0, 'release-window-after')
+    _log_directory = log_directory
+    if _log_directory is not None:
+        _log_directory = _normalize_type(
+            expandvars(_log_directory), str, 'log-directory'
+        )
+    if log_format not in _log_formats:
+        raise InvalidSettingsError(
+            f'log-format ({log_format}) must be one of {sorted(_log_formats)}'
+        )
+    if not isinstance(links, list):
+        raise InvalidSettingsError(f'links ({links}) must be a list')
+    if not isinstance(shortcuts, dict):
+        raise InvalidSettingsError(f'shortcuts ({shortcuts}) must be a mapping')
     return {
         'shell': _normalize_type(expandvars(shell), str, 'shell'),
         'home': _normalize_type(expandvars(home), str, 'home'),
+        'shell_pool': _normalize_int(shell_pool, 0, 'shell-pool'),
         'font': _normalize_font(font),
         'colors': [_normalize_color(c) for c in colors],
         'opacity': _opacity,
+        'monitor': None
+        if monitor is None
+        else _normalize_type(monitor, str, 'monitor'),
         'autohide': _normalize_bool(autohide, 'autohide'),
         'tmux': _normalize_bool(tmux, 'tmux'),
+        'scrollback_lines': _normalize_int(scrollback_lines, -1, 'scrollback-lines'),
+        'scrollback_path': _normalize_type(
+            expandvars(scrollback_path), str, 'scrollback-path'
+        ),
+        'scrollback_memory_budget': _budget,
+        'prewarm': _normalize_bool(prewarm, 'prewarm'),
+        'release_window_after': _release_after,
+        'notify': _normalize_bool(notify, 'notify'),
+        'log_directory': _log_directory,
+        'log_format': log_format,
+        'log_rotate_size': _normalize_int(log_rotate_size, 1, 'log-rotate-size'),
+        'log_rotate_age': _normalize_int(log_rotate_age, 1, 'log-rotate-age'),
+        'stats': _normalize_bool(stats, 'stats'),
+        'links': [_normalize_link(link) for link in links],
+        'shortcuts': {
+            parse_trigger(trigger): _normalize_shortcut_action(action, trigger)
+            for trigger, action in {**_defaults['shortcuts'], **shortcuts}.items()
+        },
     }
 
 
+def diff(old: dict, new: dict) -> Set[str]:
+    """Return the names of normalized settings that differ between `old` and `new`."""
+    return {key for key in new if not _equal(old.get(key), new[key])}
+
+
+def _equal(a, b) -> bool:
+    if isinstance(a, Pango.FontDescription):
+        return a.equal(b)
+    elif isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    elif isinstance(a, Gdk.RGBA):
+        return a.equal(b)
+    return a == b
+
+
+def parse_trigger(trigger: str) -> Tuple[int, int]:
+    """
+    Return the `(keyval, modifiers)` pair identifying a keyboard shortcut
+    (e.g. `<Control><Shift>c`).
+    """
+    if isinstance(trigger, str):
+        ok, keyval, modifiers = Gtk.accelerator_parse(trigger)
+        if ok and keyval != 0:
+            return (
+                Gdk.keyval_to_lower(keyval),
+                int(modifiers & Gtk.accelerator_get_default_mod_mask()),
+            )
+    raise InvalidSettingsError(f'shortcut ({trigger}) must be a valid accelerator')
+
+
+def _normalize_shortcut_action(action, trigger):
+    if action is None:
+        return None
+    elif isinstance(action, str) and action in _shortcut_actions:
+        return ('action', action)
+    elif isinstance(action, dict) and len(action) == 1:
+        ((kind, value),) = action.items()
+        if kind == 'send' and isinstance(value, str):
+            return (kind, value.encode())
+        elif kind in _shortcut_kinds and kind != 'send':
+            if isinstance(value, str):
+                value = shlex_split(value)
+            if (
+                isinstance(value, list)
+                and len(value) > 0
+                and all(isinstance(arg, str) for arg in value)
+            ):
+                return (kind, tuple(value))
+    raise InvalidSettingsError(
+        f'shortcut action for {trigger} ({action}) must be one of'
+        f' {sorted(_shortcut_actions)}'
+        f' or a mapping with one of {sorted(_shortcut_kinds)}'
+    )
+
+
+def _normalize_link(link):
+    if isinstance(link, dict) and isinstance(link.get('pattern'), str):
+        pattern = link['pattern']
+        try:
+            compile_link(pattern)
+        except GLib.Error as error:
+            raise InvalidSettingsError(
+                f'link pattern ({pattern}) is invalid: {error.message}'
+            )
+        actions = {key: value for key, value in link.items() if key != 'pattern'}
+        if not actions:
+            return (pattern, 'open', '{0}')
+        elif len(actions) == 1:
+            ((kind, value),) = actions.items()
+            if kind == 'open' and isinstance(value, str):
+                return (pattern, kind, value)
+            elif kind == 'run':
+                if isinstance(value, str):
+                    value = shlex_split(value)
+                if (
+                    isinstance(value, list)
+                    and len(value) > 0
+                    and all(isinstance(arg, str) for arg in value)
+                ):
+                    return (pattern, kind, tuple(value))
+    raise InvalidSettingsError(
+        f'link ({link}) must be a mapping with a `pattern`'
+        ' and optionally either `open` or `run`'
+    )
+
+
 def _normalize_type(value, type, name):
     if isinstance(value, type):
         return value
@@ -144,6 +489,12 @@ def _normalize_number(number, intmax):
     return None  # the number is invalid
 
 
+def _normalize_int(value, minimum, name):
+    if isinstance(value, int) and not isinstance(value, bool) and value >= minimum:
+        return value
+    raise InvalidSettingsError(f'{name} ({value}) must be an integer >= {minimum}')
+
+
 def _normalize_bool(value, name):
     if isinstance(value, bool):
         return value
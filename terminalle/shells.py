@@ -0,0 +1,171 @@
+"""Spawning shells on their own PTYs, and keeping a pool of them ready."""
+
+import logging
+from collections import deque
+from os import environ, kill
+from signal import SIGHUP
+from typing import Callable, List, Optional, Tuple
+
+import gi
+
+gi.require_version('Vte', '3.91')
+from gi.repository import Gio, GLib, Vte
+
+_logger = logging.getLogger(__name__)
+
+# Called with the PTY, and either the shell's PID or an error.
+SpawnCallback = Callable[[Vte.Pty, Optional[int], Optional[GLib.Error]], None]
+
+
+def spawn_shell(
+    argv: List[str],
+    working_directory: str,
+    size: Tuple[int, int],
+    on_spawned: SpawnCallback,
+    on_exited: Callable[[int, int], None],
+) -> Vte.Pty:
+    """
+    Spawn `argv` on a new PTY of `size` (rows and columns),
+    independently of any terminal widget,
+    and call `on_exited` with its PID and wait status when it exits.
+    Return the PTY immediately, e.g. to attach it to a terminal,
+    which then keeps it the terminal's size.
+    """
+    pty = Vte.Pty.new_sync(Vte.PtyFlags.DEFAULT, None)
+    set_size(pty, size)
+
+    def _callback(pty: Vte.Pty, result: Gio.AsyncResult, *args):
+        try:
+            _, pid = pty.spawn_finish(result)
+        except GLib.Error as error:
+            on_spawned(pty, None, error)
+            return
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, pid, on_exited)
+        on_spawned(pty, pid, None)
+
+    pty.spawn_async(
+        working_directory,  # working directory
+        argv,  # command-line arguments
+        _environment(),  # environment variables
+        GLib.SpawnFlags.DEFAULT,  # spawn flags
+        None,  # child setup callback
+        (),  # child setup callback arguments
+        -1,  # timeout
+        None,  # cancellable
+        _callback,  # spawn callback
+        (),  # spawn callback arguments
+    )
+    return pty
+
+
+def _environment() -> List[str]:
+    """Return the environment for a shell, including what VTE would add."""
+    version = (
+        Vte.get_major_version() * 10000
+        + Vte.get_minor_version() * 100
+        + Vte.get_micro_version()
+    )
+    environment = {
+        **environ,
+        'TERM': 'xterm-256color',
+        'COLORTERM': 'truecolor',
+        'VTE_VERSION': str(version),
+    }
+    return [f'{name}={value}' for name, value in environment.items()]
+
+
+def set_size(pty: Vte.Pty, size: Tuple[int, int]):
+    """Set the rows and columns of `pty`, which signals its foreground process."""
+    try:
+        pty.set_size(*size, None)
+    except GLib.Error as error:
+        _logger.warning('Failed to resize a PTY: %s', error.message)
+
+
+def hang_up(pid: int):
+    """Hang up on a shell that is no longer attached to the terminal."""
+    try:
+        kill(pid, SIGHUP)
+    except OSError:
+        pass  # already gone
+
+
+class ShellPool:
+    """
+    Shells spawned ahead of time, so that a new session starts instantly.
+
+    The pool keeps `size` shells ready (or being spawned), refilling itself
+    whenever one is taken.
+    Their PTYs are kept the size of the terminal (see `set_pty_size`),
+    so that programs started by the shell, like `tmux attach`,
+    don't run at another size until the shell is attached.
+    """
+
+    def __init__(self, spawn: Callable[[SpawnCallback], Vte.Pty], size: int = 0):
+        # Spawns a shell with the current settings.
+        self._spawn = spawn
+        self.size = size
+        # Shells ready to be attached, as `(pty, pid)` pairs, oldest first.
+        self._ready = deque()
+        self._spawning = 0
+        # The rows and columns of the terminal, if known.
+        self._pty_size = None
+
+    def fill(self):
+        """Spawn shells until the pool is full."""
+        while len(self._ready) + self._spawning < self.size:
+            self._spawning += 1
+            self._spawn(self._on_spawned)
+
+    def _on_spawned(
+        self, pty: Vte.Pty, pid: Optional[int], error: Optional[GLib.Error]
+    ):
+        self._spawning -= 1
+        if error is not None:
+            # Don't retry, which could spin if the shell can never be spawned.
+            _logger.warning('Failed to spawn a shell for the pool: %s', error.message)
+        elif len(self._ready) >= self.size:
+            hang_up(pid)  # the pool shrank in the meantime
+        else:
+            if self._pty_size is not None:
+                set_size(pty, self._pty_size)  # the terminal was resized meanwhile
+            self._ready.append((pty, pid))
+
+    def take(self) -> Optional[Tuple[Vte.Pty, int]]:
+        """Return a ready shell as a `(pty, pid)` pair, if any, and refill the pool."""
+        shell = self._ready.popleft() if self._ready else None
+        self.fill()
+        return shell
+
+    def discard(self, pid: int) -> bool:
+        """
+        Forget a shell that exited, returning whether it was in the pool.
+        It is replaced on the next `take`, rather than immediately,
+        so that a shell which exits straight away cannot keep the pool spinning.
+        """
+        for shell in self._ready:
+            if shell[1] == pid:
+                self._ready.remove(shell)
+                return True
+        return False
+
+    def set_pty_size(self, size: Tuple[int, int]):
+        """Resize the PTYs of ready shells to `size` (rows and columns), if needed."""
+        if size == self._pty_size:
+            return
+        self._pty_size = size
+        for pty, _ in self._ready:
+            set_size(pty, size)
+
+    def resize(self, size: int):
+        """Change the number of shells to keep ready."""
+        self.size = size
+        while len(self._ready) > size:
+            hang_up(self._ready.pop()[1])
+        self.fill()
+
+    def clear(self):
+        """Replace all ready shells, e.g. after the shell settings changed."""
+        while self._ready:
+            hang_up(self._ready.pop()[1])
+        self.fill()
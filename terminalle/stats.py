@@ -0,0 +1,128 @@
+"""Runtime statistics cheap enough to collect permanently."""
+
+from array import array
+from bisect import bisect_left
+from math import inf
+from os import listdir, readlink, stat, sysconf
+from os.path import join as join_path
+from tempfile import gettempdir
+from time import monotonic_ns
+from typing import List, Optional, Sequence, Tuple
+
+# Upper bounds of histogram buckets, in the unit of each kind of sample.
+latency_buckets_ms = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+frame_buckets_ms = (1, 2, 4, 8, 16, 33, 50, 100)
+throughput_buckets = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+class RingBuffer:
+    """A fixed-size buffer holding the most recent numeric samples."""
+
+    def __init__(self, size: int = 1024):
+        self._samples = array('d', bytes(8 * size))
+        self._next = 0
+        self._count = 0
+
+    def add(self, value: float):
+        self._samples[self._next] = value
+        self._next = (self._next + 1) % len(self._samples)
+        if self._count < len(self._samples):
+            self._count += 1
+
+    def histogram(self, bounds: Sequence[float]) -> List[Tuple[float, int]]:
+        """
+        Return `(upper bound, count)` pairs for the samples in the buffer.
+        The last bucket (with an infinite upper bound) counts everything else.
+        """
+        counts = [0] * (len(bounds) + 1)
+        # Until the buffer wraps, samples occupy a prefix of it.
+        for value in self._samples[: self._count]:
+            counts[bisect_left(bounds, value)] += 1
+        return list(zip([*bounds, inf], counts))
+
+
+class Stats:
+    """Rolling statistics about the running server."""
+
+    def __init__(self, size: int = 1024):
+        # Time from a visibility request until it was applied
+        # (until the next frame was painted, for showing the window).
+        self.visibility_latency_ms = RingBuffer(size)
+        # Time spent by the frame clock from `before-paint` to `after-paint`.
+        self.frame_time_ms = RingBuffer(size)
+        # Bytes read by the process per second, while the terminal is producing output.
+        # This is dominated by reading the terminal's PTY.
+        self.output_bytes_per_second = RingBuffer(size)
+        # Time from rebuilding a released window until its first frame was painted.
+        self.reattach_ms = RingBuffer(size)
+        # Memory freed by the last release of the hidden window.
+        self.released_bytes = None
+        self._output_sample = None
+
+    def sample_output(self):
+        """
+        Record the read throughput since the last sample,
+        if at least a second has passed since then.
+        Call whenever the terminal's contents change.
+        """
+        now = monotonic_ns()
+        if self._output_sample is not None and now - self._output_sample[0] < 1e9:
+            return
+        read = read_bytes()
+        if read is None:
+            return
+        if self._output_sample is not None:
+            then, previous = self._output_sample
+            # After a longer pause, only start a new interval.
+            if now - then < 2e9:
+                self.output_bytes_per_second.add((read - previous) * 1e9 / (now - then))
+        self._output_sample = (now, read)
+
+
+def rss_bytes() -> Optional[int]:
+    """Return the resident set size of this process, if available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_bytes() -> Optional[int]:
+    """Return the number of bytes read by this process so far, if available."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def scrollback_bytes() -> Optional[int]:
+    """
+    Return the storage used by deleted temporary files held open by this process,
+    which is where VTE keeps compressed scrollback, if available.
+    """
+    prefix = join_path(gettempdir(), '')
+    seen = set()
+    total = 0
+    try:
+        fds = listdir('/proc/self/fd')
+    except OSError:
+        return None
+    for fd in fds:
+        path = f'/proc/self/fd/{fd}'
+        try:
+            target = readlink(path)
+            if not (target.startswith(prefix) and target.endswith(' (deleted)')):
+                continue
+            st = stat(path)
+        except OSError:
+            continue  # e.g. closed in the meantime
+        if (st.st_dev, st.st_ino) not in seen:
+            seen.add((st.st_dev, st.st_ino))
+            # Count allocated blocks, since the files may be sparse.
+            total += st.st_blocks * 512
+    return total
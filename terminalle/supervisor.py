@@ -0,0 +1,103 @@
+"""Asynchronous launching and reaping of commands run from shortcuts."""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic_ns
+from typing import List
+
+import gi
+
+gi.require_version('Gio', '2.0')
+from gi.repository import Gio, GLib
+
+_logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """
+    Launches commands without blocking the main loop and reaps them when they exit.
+
+    At most `max_spawning` commands are being spawned at once.
+    Further commands are queued until one of those spawns finishes.
+    Commands that have been spawned don't count against the limit,
+    so long-lived ones (e.g. an editor opened from a link) don't hold up others.
+    """
+
+    def __init__(self, max_spawning: int = 8):
+        self.max_spawning = max_spawning
+        # Number of commands launched successfully, and that failed to launch.
+        self.launched = 0
+        self.failed = 0
+        self._spawning = 0
+        # Commands waiting for capacity, with the time they were requested.
+        self._queue = deque()
+        # Fork/exec happens on a single worker thread rather than the main loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='terminalle-spawn'
+        )
+
+    def launch(self, argv: List[str]):
+        """Launch `argv` as soon as there is capacity. Call from the main loop."""
+        self._queue.append((argv, monotonic_ns()))
+        self._launch_queued()
+
+    def _launch_queued(self):
+        while self._queue and self._spawning < self.max_spawning:
+            argv, requested = self._queue.popleft()
+            self._spawning += 1
+            self._executor.submit(self._spawn, argv, requested)
+
+    def _spawn(self, argv: List[str], requested: int):
+        """Spawn a child on the worker thread and hand it back to the main loop."""
+        try:
+            process = Gio.Subprocess.new(argv, Gio.SubprocessFlags.NONE)
+        except GLib.Error as error:
+            GLib.idle_add(self._on_spawn_failed, argv, error)
+        else:
+            GLib.idle_add(self._on_spawned, argv, requested, monotonic_ns(), process)
+
+    def _on_spawn_failed(self, argv: List[str], error: GLib.Error) -> bool:
+        _logger.debug('failed to launch %s: %s', argv, error.message)
+        self.failed += 1
+        self._spawning -= 1
+        self._launch_queued()
+        return GLib.SOURCE_REMOVE
+
+    def _on_spawned(
+        self,
+        argv: List[str],
+        requested: int,
+        launched: int,
+        process: Gio.Subprocess,
+    ) -> bool:
+        _logger.debug(
+            'launched %s (pid %s) in %.2f ms',
+            argv,
+            process.get_identifier(),
+            (launched - requested) / 1e6,
+        )
+        self.launched += 1
+        self._spawning -= 1
+        self._launch_queued()
+        process.wait_async(None, self._on_exited, (argv, launched))
+        return GLib.SOURCE_REMOVE
+
+    def _on_exited(self, process: Gio.Subprocess, result: Gio.AsyncResult, data: tuple):
+        argv, launched = data
+        process.wait_finish(result)
+        elapsed = (monotonic_ns() - launched) / 1e6
+        if process.get_if_exited():
+            _logger.debug(
+                '%s exited with status %d after %.2f ms',
+                argv,
+                process.get_exit_status(),
+                elapsed,
+            )
+        else:
+            _logger.debug(
+                '%s killed by signal %d after %.2f ms',
+                argv,
+                process.get_term_sig(),
+                elapsed,
+            )
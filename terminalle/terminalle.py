@@ -1,16 +1,47 @@
 """Terminalle application logic."""
 
-from subprocess import Popen
-from typing import Callable, Dict, Optional, Tuple
+import logging
+from functools import partial
+from threading import Thread
+from time import monotonic_ns, strftime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Vte', '3.91')
-from gi.repository import Gio, GLib, Gtk, Vte
+from gi.repository import Gdk, Gio, GLib, Gtk, Pango, Vte
+
+from .client import OBJECT_PATH, SERVICE_NAME
+from .export import formats as export_formats
+from .export import guess_format, save_contents
+from .instrument import begin_async, end_async, mark, span
+from .instrument import enabled as instrument_enabled
+from .links import add_links
+from .links import expand as expand_link
+from .notify import Notifier
+from .paste import Paster
+from .paste import chunk_size as paste_chunk_size
+from .paste import mime_types as paste_mime_types
+from .search import InvalidPatternError, Search
+from .session_log import SessionLog
+from .settings import InvalidSettingsError, parse_trigger
+from .settings import diff as diff_settings
+from .settings import load as load_settings
+from .shells import ShellPool, SpawnCallback, hang_up, spawn_shell
+from .stats import (
+    Stats,
+    frame_buckets_ms,
+    latency_buckets_ms,
+    rss_bytes,
+    scrollback_bytes,
+    throughput_buckets,
+)
+from .supervisor import Supervisor
+from .tmux import TmuxControl, pty_client_name
+
+_logger = logging.getLogger(__name__)
 
-SERVICE_NAME = 'party.will.Terminalle'
-OBJECT_PATH = '/party/will/Terminalle'
 SERVICE_XML = f'''
 <!DOCTYPE node PUBLIC
     "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
@@ -18,143 +49,717 @@ SERVICE_XML = f'''
 <node>
   <interface name="{SERVICE_NAME}">
     <method name="Toggle" />
+    <method name="ToggleOn">
+      <arg name="monitor" type="s" direction="in" />
+    </method>
+    <method name="Show" />
+    <method name="Hide" />
+    <method name="GetState">
+      <arg name="visible" type="b" direction="out" />
+    </method>
+    <method name="NewSession" />
+    <method name="SaveScrollback">
+      <arg name="path" type="s" direction="in" />
+      <arg name="format" type="s" direction="in" />
+    </method>
+    <method name="Search">
+      <arg name="pattern" type="s" direction="in" />
+      <arg name="flags" type="s" direction="in" />
+      <arg name="found" type="b" direction="out" />
+    </method>
+    <method name="SearchNext">
+      <arg name="found" type="b" direction="out" />
+    </method>
+    <method name="SearchPrevious">
+      <arg name="found" type="b" direction="out" />
+    </method>
     <method name="Quit" />
   </interface>
 </node>
 '''
 
+STATS_XML = f'''
+<!DOCTYPE node PUBLIC
+    "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
+    "http://www.freedesktop.org/standards/dbus/1.0/introspect.dtd">
+<node>
+  <interface name="{SERVICE_NAME}.Stats">
+    <method name="GetStats">
+      <arg name="stats" type="a{{sv}}" direction="out" />
+    </method>
+  </interface>
+</node>
+'''
+
+# How long to wait for a burst of changes to the configuration file to settle.
+_reload_delay_ms = 100
+
+# Glyphs to load and rasterize ahead of time with the `prewarm` setting:
+# printable ASCII and the box drawing characters used by e.g. tmux borders.
+_prewarm_text = ''.join(map(chr, range(0x20, 0x7F))) + '─│┌┐└┘├┤┬┴┼═║'
+
+# How often to check scrollback storage against `scrollback_memory_budget`.
+_scrollback_check_seconds = 5
+
+# The fewest lines of scrollback that enforcing the budget may leave.
+_scrollback_min_lines = 1000
+
 # key names: https://cgit.freedesktop.org/xorg/proto/x11proto/plain/keysymdef.h
 # tmux keybinding commands: https://github.com/tmux/tmux/blob/3.5a/key-bindings.c#L347
+# Each command is paired with the flag used to target the terminal's tmux client.
 _tmux_mode_commands = [
-    ('exclam', ['tmux', 'break-pane']),
-    ('quotedbl', ['tmux', 'split-window']),
-    ('numbersign', ['tmux', 'list-buffers']),
-    ('dollar', ['tmux', 'command-prompt', '-I', '#S', "rename-session -- '%%'"]),
-    ('percent', ['tmux', 'split-window', '-h']),
+    ('exclam', ['break-pane'], '-s'),
+    ('quotedbl', ['split-window'], '-t'),
+    ('numbersign', ['list-buffers'], None),
+    ('dollar', ['command-prompt', '-I', '#S', "rename-session -- '%%'"], '-t'),
+    ('percent', ['split-window', '-h'], '-t'),
     (
         'ampersand',
-        ['tmux', 'confirm-before', '-p', 'kill-window #W? (y/n)', 'kill-window'],
+        ['confirm-before', '-p', 'kill-window #W? (y/n)', 'kill-window'],
+        '-t',
     ),
     (
         'apostrophe',
         [
-            'tmux',
             'command-prompt',
             '-T',
             'window-target',
             '-pindex',
             "select-window -t ':%%'",
         ],
+        '-t',
     ),
-    ('parenleft', ['tmux', 'switch-client', '-p']),
-    ('parenright', ['tmux', 'switch-client', '-n']),
-    ('comma', ['tmux', 'command-prompt', '-I', '#W', "rename-window -- '%%'"]),
-    ('period', ['tmux', 'command-prompt', '-T', 'target', "move-window -t '%%'"]),
-    ('colon', ['tmux', 'command-prompt']),
-    ('semicolon', ['tmux', 'last-pane']),
-    ('equal', ['tmux', 'choose-buffer', '-Z']),
-    ('bracketleft', ['tmux', 'copy-mode']),
-    ('bracketright', ['tmux', 'paste-buffer']),
-    ('braceleft', ['tmux', 'swap-pane', '-U']),
-    ('braceright', ['tmux', 'swap-pane', '-D']),
+    ('parenleft', ['switch-client', '-p'], '-c'),
+    ('parenright', ['switch-client', '-n'], '-c'),
+    ('comma', ['command-prompt', '-I', '#W', "rename-window -- '%%'"], '-t'),
+    ('period', ['command-prompt', '-T', 'target', "move-window -t '%%'"], '-t'),
+    ('colon', ['command-prompt'], '-t'),
+    ('semicolon', ['last-pane'], '-t'),
+    ('equal', ['choose-buffer', '-Z'], '-t'),
+    ('bracketleft', ['copy-mode'], '-t'),
+    ('bracketright', ['paste-buffer'], '-t'),
+    ('braceleft', ['swap-pane', '-U'], '-t'),
+    ('braceright', ['swap-pane', '-D'], '-t'),
 ]
 
 
 class Terminalle:
     """Manages the D-Bus service and the terminal window."""
 
-    def __init__(self, settings: Dict[str, object], show: bool):
-        """Initialize the window and VTE widget."""
-        self.app = Gtk.Application(application_id=SERVICE_NAME)
+    def __init__(
+        self,
+        settings: Dict[str, object],
+        show: bool,
+        config_path: Optional[str] = None,
+    ):
+        """
+        Initialize the window and VTE widget.
+
+        If `config_path` is given,
+        the settings are reloaded whenever that file changes.
+        """
+        self.app = _Application(self._register_dbus, application_id=SERVICE_NAME)
         self.app.connect('activate', self._on_activate)
+        # Each method is responsible for returning a value to the invocation.
+        self.methods = {
+            'Toggle': self._call_toggle,
+            'ToggleOn': self._call_toggle_on,
+            'Show': self._call_show,
+            'Hide': self._call_hide,
+            'GetState': self._call_get_state,
+            'NewSession': self._call_new_session,
+            'SaveScrollback': self._call_save_scrollback,
+            'Search': self._call_search,
+            'SearchNext': partial(self._call_search_again, False),
+            'SearchPrevious': partial(self._call_search_again, True),
+            'Quit': self._call_quit,
+        }
+        # Runtime statistics, if enabled.
+        self.stats = Stats() if settings['stats'] else None
+        if self.stats is not None:
+            self.methods['GetStats'] = self._call_get_stats
+        # Method calls received before the terminal is ready,
+        # as `(method_name, invocation)` pairs.
+        self.pending_calls = []
+        self.ready = False
+        # Requested visibility, to be applied by `_visibility_source` on the main loop.
+        self.target_visible = False
+        # Requested monitor to show the window on, or `None` for the default.
+        self.target_monitor = None
+        self._visibility_source = None
+        # When the pending visibility change was first requested.
+        self._visibility_requested = None
+        # Callbacks for when the requested visibility has been applied.
+        self._visibility_callbacks = []
+        # Callbacks for when the next frame has been painted.
+        self._paint_callbacks = []
+        self._paint_handler = None
         self.settings = settings
         self.show_on_startup = show
+        self.config_path = config_path
+        self.supervisor = Supervisor()
 
+    @span('activate')
     def _on_activate(self, app: Gtk.Application):
-        """Create and show the main window."""
-        window = Gtk.ApplicationWindow(application=app)
-        window.set_title('Terminalle')
-        # https://specifications.freedesktop.org/icon-naming-spec/latest/
-        window.set_icon_name('utilities-terminal')
-        window.set_decorated(False)
-        # Make the application window's background transparent using CSS.
-        css_provider = Gtk.CssProvider()
-        css_provider.load_from_data(
-            b'window { background-color: rgba(0, 0, 0, 0); background-image: none; }'
-        )
-        Gtk.StyleContext.add_provider_for_display(
-            window.get_display(),
-            css_provider,
-            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
+        """Create the main window and spawn the shell."""
+        mark('activate')
+        self.tmux = TmuxControl(self.supervisor)
+        self.actions = {
+            'copy-clipboard': self._copy_clipboard,
+            'paste-clipboard': self._paste_clipboard,
+            'toggle': self.toggle,
+            'new-session': self.new_session,
+            'save-scrollback': self._save_scrollback,
+            'search': self._toggle_search_bar,
+            'quit': self.quit,
+        }
+        # The paste in progress, if any.
+        self.paster = None
+        # The recording of the terminal's output, if enabled.
+        self.session_log = None
+        # Clicking a notification toggles the window, like the `toggle` action.
+        toggle_action = Gio.SimpleAction.new('toggle', None)
+        toggle_action.connect('activate', self._on_toggle_action)
+        app.add_action(toggle_action)
+        self.notifier = Notifier(app, 'toggle')
+        self._build_window()
+        self._apply_session_log()
+        self._budget_source = None
+        # Whether the scrollback limit is lowered below the setting to meet the budget.
+        self._scrollback_limited = False
+        self._apply_scrollback_budget()
+        # Pending release of the window while it is hidden.
+        self._release_source = None
+
+        # Shells are spawned on PTYs owned by this object rather than the terminal,
+        # so that the terminal can be switched to another shell
+        # without hanging up on the shell.
+        # The pool is filled once the first shell is up.
+        self.pool = ShellPool(self._spawn_shell)
+        self.pid = None
+        begin_async('spawn')
+        self.pty = self._spawn_shell(self._term_spawn_async_callback)
+        self.terminal.set_pty(self.pty)
+
+        if self.config_path is not None:
+            self._watch_config()
+        mark('activated')
+
+    def _build_window(self, terminal: Optional[Vte.Terminal] = None):
+        """Create the window, around `terminal` or a new terminal widget."""
+        window = new_window(self.app)
+        window.connect('realize', self._watch_size)
+        if self.stats is not None:
+            window.connect('realize', self._on_realize)
+        if terminal is None:
+            terminal = self._new_terminal()
+        # Show the progress of long pastes over the bottom of the terminal.
+        paste_progress = Gtk.ProgressBar(
+            valign=Gtk.Align.END, show_text=True, visible=False
         )
-        # Maximize the window because fullscreen does not support transparency.
-        # https://gitlab.freedesktop.org/wayland/wayland-protocols/-/issues/116
-        window.maximize()
-        if self.settings['autohide']:
-            focus_controller = Gtk.EventControllerFocus()
-            focus_controller.connect('leave', self._autohide)
-            window.add_controller(focus_controller)
-
-        terminal = Vte.Terminal()
-        terminal.set_font(font_desc=self.settings['font'])
-        terminal.set_allow_bold(True)
-        terminal.set_allow_hyperlink(True)
-        bg = self.settings['colors'][0].copy()
-        bg.alpha = self.settings['opacity']
-        terminal.set_colors(background=bg, palette=self.settings['colors'])
-        terminal.connect('child-exited', self._term_exited)
-        window.set_child(terminal)
+        # Search the scrollback from a bar over the top of the terminal.
+        # The entry waits for typing to pause before emitting `search-changed`.
+        search_entry = Gtk.SearchEntry(hexpand=True)
+        search_entry.connect('search-changed', self._on_search_changed)
+        search_entry.connect('activate', self._on_search_previous)
+        search_entry.connect('previous-match', self._on_search_previous)
+        search_entry.connect('next-match', self._on_search_next)
+        search_entry.connect('stop-search', self._on_stop_search)
+        search_bar = Gtk.SearchBar(child=search_entry, valign=Gtk.Align.START)
+        search_bar.connect_entry(search_entry)
+        overlay = Gtk.Overlay(child=terminal)
+        overlay.add_overlay(paste_progress)
+        overlay.add_overlay(search_bar)
+        window.set_child(overlay)
 
         self.window = window
         self.terminal = terminal
+        # The monitor the window was last put on, or `None` if it is just maximized.
+        self._placed_monitor = None
+        self.paste_progress = paste_progress
+        self.search_bar = search_bar
+        self.search_entry = search_entry
+        # The search of the terminal's buffer, if any.
+        self.search = None
+        self.focus_controller = None
+        self._apply_autohide()
+
+        # Set up keyboard shortcuts.
+        # All of them are dispatched by a single controller through one lookup table.
+        self.shortcuts = self._compile_shortcuts()
+        key_controller = Gtk.EventControllerKey()
+        key_controller.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        key_controller.connect('key-pressed', self._on_key_pressed)
+        window.add_controller(key_controller)
+
+    def _new_terminal(self) -> Vte.Terminal:
+        """Create the terminal widget, which outlives any window it is shown in."""
+        terminal = new_terminal(self.settings)
+        if self.stats is not None:
+            terminal.connect('contents-changed', self._on_contents_changed)
+        # Open links (explicit or matching the `links` setting) with Ctrl+click,
+        # before the terminal starts a selection.
+        link_click = Gtk.GestureClick(button=Gdk.BUTTON_PRIMARY)
+        link_click.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        link_click.connect('pressed', self._on_terminal_clicked)
+        terminal.add_controller(link_click)
+        self.link_actions = add_links(terminal, self.settings['links'])
+        if self.session_log is not None:
+            self.session_log.attach(terminal)
+        return terminal
+
+    def _release_window(self) -> bool:
+        """
+        Destroy the hidden window to free its surface and rendering state.
+
+        The terminal widget is kept, unparented and unrealized,
+        so that it keeps reading the shell's output and keeps its scrollback
+        (otherwise a program writing more than the PTY buffers would block).
+        """
+        self._release_source = None
+        self._cancel_paste()
+        self._cancel_search()
+        before = rss_bytes()
+        # Keep running without any windows.
+        self.app.hold()
+        self.terminal.get_parent().set_child(None)
+        self.window.destroy()
+        self.window = None
+        self.focus_controller = None
+        self._paint_handler = None
+        # Give the toolkit a moment to free resources before measuring.
+        GLib.timeout_add_seconds(1, self._on_window_released, before)
+        return GLib.SOURCE_REMOVE
+
+    def _on_window_released(self, before: Optional[int]) -> bool:
+        after = rss_bytes()
+        if before is not None and after is not None:
+            _logger.info('Released the hidden window, freeing %d bytes', before - after)
+            if self.stats is not None:
+                self.stats.released_bytes = before - after
+        return GLib.SOURCE_REMOVE
+
+    def _reattach_window(self):
+        """Rebuild the window around the terminal widget."""
+        self._build_window(self.terminal)
+        self.app.release()
+
+    def _on_window_reattached(self, started: int):
+        elapsed_ms = (monotonic_ns() - started) / 1e6
+        _logger.debug('Reattached the terminal in %.1f ms', elapsed_ms)
+        if self.stats is not None:
+            self.stats.reattach_ms.add(elapsed_ms)
+
+    def _schedule_release(self):
+        """Release the window once it has been hidden for long enough, if enabled."""
+        delay = self.settings['release_window_after']
+        if delay is not None and self._release_source is None:
+            self._release_source = GLib.timeout_add_seconds(delay, self._release_window)
+
+    def _cancel_release(self):
+        if self._release_source is not None:
+            GLib.source_remove(self._release_source)
+            self._release_source = None
 
-        terminal.spawn_async(
-            Vte.PtyFlags.DEFAULT,  # PTY flags
-            self.settings['home'],  # working directory
-            [self.settings['shell']],  # command-line arguments
-            None,  # environment variables
-            GLib.SpawnFlags.DEFAULT,  # spawn flags
-            None,  # child setup callback
-            (),  # child setup callback arguments
-            -1,  # timeout
-            None,  # cancellable
-            self._term_spawn_async_callback,  # spawn callback
-            (),  # spawn callback arguments
+    def _apply_autohide(self):
+        """Add or remove the focus controller according to the `autohide` setting."""
+        if self.settings['autohide'] and self.focus_controller is None:
+            self.focus_controller = Gtk.EventControllerFocus()
+            self.focus_controller.connect('leave', self._autohide)
+            self.window.add_controller(self.focus_controller)
+        elif not self.settings['autohide'] and self.focus_controller is not None:
+            self.window.remove_controller(self.focus_controller)
+            self.focus_controller = None
+
+    def _apply_session_log(self):
+        """Start, stop or reconfigure recording according to the `log_*` settings."""
+        if self.session_log is not None:
+            self.session_log.close()
+            self.session_log = None
+        if self.settings['log_directory'] is None:
+            return
+        self.session_log = SessionLog(
+            self.settings['log_directory'],
+            self.settings['log_format'],
+            self.settings['log_rotate_size'] * 1024 * 1024,
+            self.settings['log_rotate_age'],
         )
+        self.session_log.attach(self.terminal)
 
-        # Set up keyboard shortcuts.
-        shortcut_controller = Gtk.ShortcutController()
-        shortcut_controller.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
-        _add_shortcut(shortcut_controller, '<Control><Shift>c', self._copy_clipboard)
-        _add_shortcut(shortcut_controller, '<Control><Shift>v', self._paste_clipboard)
+    def _apply_scrollback_budget(self):
+        """Start or stop enforcing the `scrollback_memory_budget` setting."""
+        if self._scrollback_limited:
+            apply_scrollback(self.terminal, self.settings)
+            self._scrollback_limited = False
+        if self._budget_source is not None:
+            GLib.source_remove(self._budget_source)
+            self._budget_source = None
+        if self.settings['scrollback_memory_budget'] is not None:
+            self._budget_source = GLib.timeout_add_seconds(
+                _scrollback_check_seconds, self._check_scrollback_budget
+            )
+
+    def _check_scrollback_budget(self) -> bool:
+        """
+        Drop the oldest lines of scrollback if its storage exceeds the budget,
+        by lowering the scrollback limit in proportion to the excess,
+        then restore the configured limit once the storage is within the budget.
+        """
+        used = scrollback_bytes()
+        if used is None:
+            return GLib.SOURCE_CONTINUE
+        budget = self.settings['scrollback_memory_budget'] * 1024 * 1024
+        if used <= budget:
+            if self._scrollback_limited:
+                # The dropped lines are gone, and the rest can grow again.
+                apply_scrollback(self.terminal, self.settings)
+                self._scrollback_limited = False
+            return GLib.SOURCE_CONTINUE
+        lines = self._scrollback_line_count()
+        if lines == 0:
+            # The alternate screen (e.g. of vim or tmux) is active, without scrollback,
+            # or there's no scrollback to drop anyway.
+            return GLib.SOURCE_CONTINUE
+        # Leave some headroom so that the limit isn't hit again immediately.
+        limit = max(_scrollback_min_lines, int(lines * budget / used * 0.9))
+        if limit >= lines:
+            return GLib.SOURCE_CONTINUE
+        self.terminal.set_scrollback_lines(limit)
+        self._scrollback_limited = True
+        _logger.info(
+            'Scrollback uses %d bytes, over the budget of %d; limited to %d lines',
+            used,
+            budget,
+            limit,
+        )
+        return GLib.SOURCE_CONTINUE
+
+    def _scrollback_line_count(self) -> int:
+        """Return the number of lines retained above the visible rows."""
+        adjustment = self.terminal.get_vadjustment()
+        lines = adjustment.get_upper() - adjustment.get_lower()
+        return max(0, int(lines) - self.terminal.get_row_count())
+
+    def _watch_config(self):
+        """Reload the settings whenever the configuration file changes."""
+        self._config_monitor = Gio.File.new_for_path(self.config_path).monitor_file(
+            Gio.FileMonitorFlags.WATCH_MOVES, None
+        )
+        self._config_monitor.connect('changed', self._on_config_changed)
+        self._reload_source = None
+        self._reload_generation = 0
+
+    def _on_config_changed(
+        self,
+        monitor: Gio.FileMonitor,
+        file: Gio.File,
+        other_file: Optional[Gio.File],
+        event_type: Gio.FileMonitorEvent,
+    ):
+        # Wait for `CHANGES_DONE_HINT` rather than reloading partially-written files.
+        if event_type in (
+            Gio.FileMonitorEvent.CHANGED,
+            Gio.FileMonitorEvent.ATTRIBUTE_CHANGED,
+        ):
+            return
+        # Editors tend to produce bursts of events, so coalesce them.
+        if self._reload_source is None:
+            self._reload_source = GLib.timeout_add(_reload_delay_ms, self._reload)
+
+    def _reload(self) -> bool:
+        """Load the settings on a worker thread, then apply them on the main loop."""
+        self._reload_source = None
+        self._reload_generation += 1
+        Thread(
+            target=self._load_settings,
+            args=(self._reload_generation,),
+            daemon=True,
+        ).start()
+        return GLib.SOURCE_REMOVE
+
+    def _load_settings(self, generation: int):
+        try:
+            settings = load_settings(self.config_path, strict=True)
+        except InvalidSettingsError as error:
+            _logger.warning(
+                'Keeping the current settings; ignoring %s: %s', self.config_path, error
+            )
+            return
+        GLib.idle_add(self._apply_settings, generation, settings)
+
+    def _apply_settings(self, generation: int, settings: Dict[str, object]) -> bool:
+        """Apply only the settings that changed to the live terminal and window."""
+        if generation != self._reload_generation:
+            return GLib.SOURCE_REMOVE  # superseded by a later reload
+        changed = diff_settings(self.settings, settings)
+        self.settings = settings
+        if 'font' in changed:
+            apply_font(self.terminal, self.settings)
+        if 'colors' in changed or 'opacity' in changed:
+            apply_colors(self.terminal, self.settings)
+        if 'scrollback_lines' in changed:
+            apply_scrollback(self.terminal, self.settings)
+        if 'tmux' in changed or 'shortcuts' in changed:
+            self.shortcuts = self._compile_shortcuts()
+        if 'links' in changed:
+            self.link_actions = add_links(self.terminal, self.settings['links'])
+        # A released window is rebuilt with the current settings when shown.
+        if self.window is not None:
+            if 'autohide' in changed:
+                self._apply_autohide()
+            if 'monitor' in changed and self._is_visible():
+                self._place_window()
+        if 'scrollback_lines' in changed or 'scrollback_memory_budget' in changed:
+            self._apply_scrollback_budget()
+        if 'notify' in changed:
+            if not self.settings['notify']:
+                self.notifier.unwatch()
+            elif not self._is_visible():
+                self.notifier.watch(self.terminal)
+        if any(key.startswith('log_') for key in changed):
+            self._apply_session_log()
+        if 'release_window_after' in changed and self._release_source is not None:
+            self._cancel_release()
+            self._schedule_release()
+        if 'shell' in changed or 'home' in changed:
+            self.pool.clear()
+        if 'shell_pool' in changed:
+            self.pool.resize(self.settings['shell_pool'])
+        if 'stats' in changed:
+            _logger.info('Restart Terminalle to apply the `stats` setting')
+        _logger.debug('Reloaded settings; changed: %s', sorted(changed))
+        return GLib.SOURCE_REMOVE
+
+    def _compile_shortcuts(self) -> Dict[Tuple[int, int], Callable[[], None]]:
+        """
+        Return a table mapping `(keyval, modifiers)` pairs to shortcut handlers.
+        Configured shortcuts take precedence over tmux mode shortcuts.
+        """
+        shortcuts = {}
         if self.settings['tmux']:
-            for key_name, cmd in _tmux_mode_commands:
-                _add_shortcut(
-                    shortcut_controller, f'<Control>{key_name}', _run_cmd_handler(cmd)
+            for key_name, command, target_flag in _tmux_mode_commands:
+                shortcuts[parse_trigger(f'<Control>{key_name}')] = partial(
+                    self.tmux.run, command, target_flag
                 )
-        window.add_controller(shortcut_controller)
+        for trigger, action in self.settings['shortcuts'].items():
+            if action is None:
+                shortcuts.pop(trigger, None)
+                continue
+            kind, value = action
+            if kind == 'action':
+                shortcuts[trigger] = self.actions[value]
+            elif kind == 'send':
+                shortcuts[trigger] = partial(self.terminal.feed_child, value)
+            elif kind == 'run':
+                shortcuts[trigger] = partial(self.supervisor.launch, list(value))
+            elif kind == 'tmux':
+                shortcuts[trigger] = partial(self.tmux.run, list(value))
+        return shortcuts
+
+    def _on_key_pressed(
+        self,
+        controller: Gtk.EventControllerKey,
+        keyval: int,
+        keycode: int,
+        state: Gdk.ModifierType,
+    ) -> bool:
+        """
+        Dispatch a key press to the matching shortcut, if any.
+
+        Like `Gtk.ShortcutTrigger`, fall back to the key's keyval in the first layout
+        (group 0), so shortcuts still work while e.g. a Cyrillic layout is active.
+        """
+        modifiers = int(state & Gtk.accelerator_get_default_mod_mask())
+        handler = self._find_shortcut(keyval, modifiers)
+        if handler is None:
+            display = controller.get_widget().get_display()
+            ok, base_keyval, *_ = display.translate_key(keycode, state, 0)
+            if ok and base_keyval != keyval:
+                handler = self._find_shortcut(base_keyval, modifiers)
+        if handler is None:
+            return False
+        with span('shortcut'):
+            handler()
+        return True
+
+    def _find_shortcut(
+        self, keyval: int, modifiers: int
+    ) -> Optional[Callable[[], None]]:
+        lower = Gdk.keyval_to_lower(keyval)
+        handler = self.shortcuts.get((lower, modifiers))
+        if (
+            handler is None
+            and modifiers & Gdk.ModifierType.SHIFT_MASK
+            and lower == Gdk.keyval_to_upper(keyval)
+        ):
+            # Shift was only needed to produce a symbol without case (e.g. `exclam`),
+            # so match shortcuts like `<Control>exclam`.
+            handler = self.shortcuts.get(
+                (lower, modifiers & ~Gdk.ModifierType.SHIFT_MASK)
+            )
+        return handler
+
+    def _spawn_shell(self, on_spawned: SpawnCallback) -> Vte.Pty:
+        return spawn_shell(
+            [self.settings['shell']],
+            self.settings['home'],
+            self._terminal_size(),
+            on_spawned,
+            self._term_exited,
+        )
+
+    def _terminal_size(self) -> Tuple[int, int]:
+        return self.terminal.get_row_count(), self.terminal.get_column_count()
+
+    def _watch_size(self, window: Gtk.Window):
+        """Keep the shells in the pool the terminal's size, now that it has one."""
+        window.get_frame_clock().connect('layout', self._on_layout)
+
+    def _on_layout(self, clock: Gdk.FrameClock):
+        self.pool.set_pty_size(self._terminal_size())
 
     def _term_spawn_async_callback(
-        self, terminal: Vte.Terminal, pid: int, error: Optional[GLib.Error], *args
+        self, pty: Vte.Pty, pid: Optional[int], error: Optional[GLib.Error]
     ):
-        """Finish starting up after the terminal has been spawned."""
+        """Finish starting up after the shell has been spawned."""
+        end_async('spawn')
+        mark('spawned')
         if error is not None:
+            for _, invocation in self.pending_calls:
+                invocation.return_dbus_error(
+                    f'{SERVICE_NAME}.Error.SpawnFailed', error.message
+                )
+            self.pending_calls = []
             self.quit()
             raise RuntimeError(
                 f'Error spawning VTE [{error.domain}:{error.code}]: {error.message}'
             )
+        self.pid = pid
+        self.tmux.client = pty_client_name(pty.get_fd())
         if self.show_on_startup:
             self.window.present()
             self.window.grab_focus()
+            if instrument_enabled():
+                self._after_next_paint(partial(mark, 'first-frame'))
+        elif self.settings['prewarm']:
+            steps = self._prewarm_steps()
+            GLib.idle_add(
+                lambda: next(steps, None) is not None, priority=GLib.PRIORITY_LOW
+            )
 
-        self.methods = {
-            'Toggle': self.toggle,
-            'Quit': self.quit,
-        }
+        self.ready = True
+        for method_name, invocation in self.pending_calls:
+            self._invoke(method_name, invocation)
+        self.pending_calls = []
+        if self.settings['shell_pool'] > 0:
+            GLib.idle_add(self._fill_pool, priority=GLib.PRIORITY_LOW)
+
+    def _fill_pool(self) -> bool:
+        self.pool.resize(self.settings['shell_pool'])
+        return GLib.SOURCE_REMOVE
+
+    def new_session(self):
+        """
+        Replace the shell with a new one, from the pool if possible,
+        hanging up on the current shell.
+        """
+        shell = self.pool.take()
+        if shell is not None:
+            self._attach_shell(*shell)
+        else:
+            self._spawn_shell(self._on_session_spawned)
+
+    def _on_session_spawned(
+        self, pty: Vte.Pty, pid: Optional[int], error: Optional[GLib.Error]
+    ):
+        if error is not None:
+            _logger.warning('Failed to spawn a new shell: %s', error.message)
+            if self.pid is None:
+                self.quit()  # the previous shell is gone too
+            return
+        self._attach_shell(pty, pid)
+
+    def _attach_shell(self, pty: Vte.Pty, pid: int):
+        """Switch the terminal to a running shell."""
+        previous = self.pid
+        self.pty = pty
+        self.pid = pid
+        if previous is not None:
+            hang_up(previous)
+        self._cancel_paste()
+        self._cancel_search()
+        if self.session_log is not None:
+            # Record the rest of the previous session first.
+            self.session_log.detach()
+        # Clear the screen and scrollback of the previous session.
+        self.terminal.reset(True, True)
+        self.terminal.set_pty(pty)
+        if self.session_log is not None:
+            self.session_log.attach(self.terminal)
+        self.tmux.client = pty_client_name(pty.get_fd())
+
+    def _prewarm_steps(self) -> Iterator[bool]:
+        """
+        Prepare the hidden window to be shown quickly, one step per iteration,
+        stopping early if the window is shown or released in the meantime.
+        """
+        window = self.window
+        terminal = self.terminal
+
+        def _stale() -> bool:
+            return self.window is not window or window.is_visible()
+
+        # Create the surface and renderer (e.g. an OpenGL context).
+        window.realize()
+        yield True
+        # Load the font in each style VTE uses, and shape the common glyphs.
+        layouts = []
+        for weight, style in [
+            (Pango.Weight.NORMAL, Pango.Style.NORMAL),
+            (Pango.Weight.BOLD, Pango.Style.NORMAL),
+            (Pango.Weight.NORMAL, Pango.Style.ITALIC),
+            (Pango.Weight.BOLD, Pango.Style.ITALIC),
+        ]:
+            if _stale():
+                return
+            font = self.settings['font'].copy()
+            font.set_weight(weight)
+            font.set_style(style)
+            layout = terminal.create_pango_layout(_prewarm_text)
+            layout.set_font_description(font)
+            layout.get_pixel_extents()
+            layouts.append(layout)
+            yield True
+        if _stale():
+            return
+        # Rasterize the glyphs into the renderer's glyph cache.
+        snapshot = Gtk.Snapshot()
+        for layout in layouts:
+            snapshot.append_layout(layout, self.settings['colors'][7])
+        node = snapshot.to_node()
+        renderer = window.get_renderer()
+        if node is not None and renderer is not None:
+            renderer.render_texture(node, None)
+        mark('prewarmed')
+
+    @span('dbus-register')
+    def _register_dbus(self, connection: Gio.DBusConnection):
+        """
+        Export the D-Bus interface.
+
+        This happens before the application acquires its bus name,
+        so that calls which caused D-Bus activation never find the object missing.
+        """
         service = Gio.DBusNodeInfo.new_for_xml(SERVICE_XML)
-        self.app.get_dbus_connection().register_object(
+        connection.register_object(
             OBJECT_PATH, service.interfaces[0], self._on_method_call
         )
+        if self.stats is not None:
+            stats = Gio.DBusNodeInfo.new_for_xml(STATS_XML)
+            connection.register_object(
+                OBJECT_PATH, stats.interfaces[0], self._on_method_call
+            )
+        mark('dbus-registered')
 
     def _on_method_call(
         self,
@@ -166,65 +771,552 @@ class Terminalle:
         parameters: Tuple,
         invocation: Gio.DBusMethodInvocation,
     ):
-        """Handle a D-Bus method invocation."""
-        self.methods[method_name]()
-        invocation.return_value()
+        """Handle a D-Bus method invocation, or queue it until the terminal is ready."""
+        mark('dbus-call')
+        if self.ready:
+            self._invoke(method_name, invocation)
+        else:
+            self.pending_calls.append((method_name, invocation))
+
+    def _invoke(self, method_name: str, invocation: Gio.DBusMethodInvocation):
+        self.methods[method_name](invocation)
+
+    def _call_toggle(self, invocation: Gio.DBusMethodInvocation):
+        self.toggle()
+        invocation.return_value(None)
+
+    def _call_toggle_on(self, invocation: Gio.DBusMethodInvocation):
+        (name,) = invocation.get_parameters().unpack()
+        monitor = None
+        if name:
+            display = Gdk.Display.get_default()
+            monitor = find_monitor(display, name)
+            if monitor is None:
+                invocation.return_dbus_error(
+                    'org.freedesktop.DBus.Error.InvalidArgs',
+                    f'monitor ({name}) must be one of {monitor_names(display)}',
+                )
+                return
+        self.toggle(monitor)
+        invocation.return_value(None)
+
+    def _call_show(self, invocation: Gio.DBusMethodInvocation):
+        # Reply once the window has actually been presented.
+        self.set_visible(True, partial(invocation.return_value, None))
+
+    def _call_hide(self, invocation: Gio.DBusMethodInvocation):
+        self.set_visible(False, partial(invocation.return_value, None))
+
+    def _call_get_state(self, invocation: Gio.DBusMethodInvocation):
+        invocation.return_value(GLib.Variant('(b)', (self._is_visible(),)))
+
+    def _call_new_session(self, invocation: Gio.DBusMethodInvocation):
+        self.new_session()
+        invocation.return_value(None)
+
+    def _call_save_scrollback(self, invocation: Gio.DBusMethodInvocation):
+        path, format = invocation.get_parameters().unpack()
+        format = format or guess_format(path)
+        if format not in export_formats:
+            invocation.return_dbus_error(
+                'org.freedesktop.DBus.Error.InvalidArgs',
+                f'format ({format}) must be one of {sorted(export_formats)}',
+            )
+            return
+        self.save_scrollback(
+            path, format, partial(self._on_scrollback_saved, invocation)
+        )
+
+    def _on_scrollback_saved(
+        self, invocation: Gio.DBusMethodInvocation, error: Optional[str]
+    ):
+        if error is None:
+            invocation.return_value(None)
+        else:
+            invocation.return_dbus_error(f'{SERVICE_NAME}.Error.SaveFailed', error)
+
+    def _call_search(self, invocation: Gio.DBusMethodInvocation):
+        pattern, flags = invocation.get_parameters().unpack()
+        try:
+            self.start_search(pattern, flags)
+        except InvalidPatternError as error:
+            invocation.return_dbus_error(
+                'org.freedesktop.DBus.Error.InvalidArgs', str(error)
+            )
+            return
+        self.search.find(True, partial(self._on_search_found, invocation))
+
+    def _call_search_again(self, backward: bool, invocation: Gio.DBusMethodInvocation):
+        if self.search is None:
+            invocation.return_value(GLib.Variant('(b)', (False,)))
+            return
+        self.search.find(backward, partial(self._on_search_found, invocation))
+
+    def _on_search_found(self, invocation: Gio.DBusMethodInvocation, found: bool):
+        invocation.return_value(GLib.Variant('(b)', (found,)))
+
+    def _call_quit(self, invocation: Gio.DBusMethodInvocation):
+        self.quit()
+        invocation.return_value(None)
+
+    def _call_get_stats(self, invocation: Gio.DBusMethodInvocation):
+        stats = self.stats
+        snapshot = {
+            'visibility-latency-ms': GLib.Variant(
+                'a(du)', stats.visibility_latency_ms.histogram(latency_buckets_ms)
+            ),
+            'frame-time-ms': GLib.Variant(
+                'a(du)', stats.frame_time_ms.histogram(frame_buckets_ms)
+            ),
+            'output-bytes-per-second': GLib.Variant(
+                'a(du)', stats.output_bytes_per_second.histogram(throughput_buckets)
+            ),
+            'reattach-ms': GLib.Variant(
+                'a(du)', stats.reattach_ms.histogram(latency_buckets_ms)
+            ),
+            'scrollback-lines': GLib.Variant('t', self._scrollback_line_count()),
+            'commands-launched': GLib.Variant('t', self.supervisor.launched),
+            'commands-failed': GLib.Variant('t', self.supervisor.failed),
+            'tmux-commands-sent': GLib.Variant('t', self.tmux.sent),
+        }
+        rss = rss_bytes()
+        if rss is not None:
+            snapshot['rss-bytes'] = GLib.Variant('t', rss)
+        if stats.released_bytes is not None:
+            snapshot['released-bytes'] = GLib.Variant('x', stats.released_bytes)
+        if self.session_log is not None:
+            snapshot['log-dropped-bytes'] = GLib.Variant('t', self.session_log.dropped)
+        scrollback = scrollback_bytes()
+        if scrollback is not None:
+            snapshot['scrollback-bytes'] = GLib.Variant('t', scrollback)
+        invocation.return_value(GLib.Variant('(a{sv})', (snapshot,)))
 
     def run(self):
         """Run the GTK application."""
+        mark('run')
         self.app.run(None)
+        if self.session_log is not None:
+            # Give the writer a moment to finish, now that the main loop has stopped.
+            self.session_log.join(1)
 
-    def toggle(self):
-        """Toggle window visibility."""
-        GLib.idle_add(self._toggle)
-
-    def _toggle(self):
-        if self.window.is_visible():
-            self.window.set_visible(False)
+    @span('toggle')
+    def toggle(self, monitor: Optional[Gdk.Monitor] = None):
+        """
+        Toggle window visibility.
+        If `monitor` is given and the window is visible on another one,
+        move it there instead of hiding it.
+        """
+        if self._visibility_source is None:
+            visible = self._is_visible()
+            placed = self._placed_monitor
         else:
+            visible = self.target_visible
+            placed = self.target_monitor
+        if visible and monitor is not None and monitor != placed:
+            self.set_visible(True, monitor=monitor)
+        else:
+            self.set_visible(not visible, monitor=monitor)
+
+    def _on_toggle_action(self, action: Gio.SimpleAction, parameter: None):
+        self.toggle()
+
+    def set_visible(
+        self,
+        visible: bool,
+        callback: Optional[Callable[[], None]] = None,
+        monitor: Optional[Gdk.Monitor] = None,
+    ):
+        """
+        Show or hide the window on the next main loop iteration.
+
+        Requests made before then are collapsed into a single net change.
+        If given, `callback` is called once the window is hidden,
+        or once a frame has been painted after showing it.
+        The window is shown on `monitor`, if given,
+        otherwise on the one named by the `monitor` setting, if any.
+        """
+        self.target_visible = visible
+        if visible:
+            self.target_monitor = monitor
+        if callback is not None:
+            self._visibility_callbacks.append(callback)
+        if self._visibility_source is None:
+            if self.stats is not None:
+                self._visibility_requested = monotonic_ns()
+            self._visibility_source = GLib.idle_add(self._apply_visibility)
+
+    @span('apply-visibility')
+    def _apply_visibility(self) -> bool:
+        self._visibility_source = None
+        callbacks = self._visibility_callbacks
+        self._visibility_callbacks = []
+        if self.target_visible and (
+            not self._is_visible() or self._resolve_monitor() != self._placed_monitor
+        ):
+            self._cancel_release()
+            self.notifier.unwatch()
+            reattached = None
+            if self.window is None:
+                reattached = monotonic_ns()
+                self._reattach_window()
+            self._place_window()
             self.window.set_visible(True)
             self.window.grab_focus()
+            mark('visibility-applied')
+            if reattached is not None:
+                self._after_next_paint(partial(self._on_window_reattached, reattached))
+            if self.stats is not None:
+                self._after_next_paint(
+                    partial(self._record_visibility, self._visibility_requested)
+                )
+            for callback in callbacks:
+                self._after_next_paint(callback)
+            return GLib.SOURCE_REMOVE
+        elif not self.target_visible and self._is_visible():
+            self.window.set_visible(False)
+            # No more frames will be painted, so don't leave anyone waiting.
+            callbacks += self._paint_callbacks
+            self._paint_callbacks = []
+            self._schedule_release()
+            if self.settings['notify']:
+                self.notifier.watch(self.terminal)
+            if self.stats is not None:
+                self._record_visibility(self._visibility_requested)
+        mark('visibility-applied')
+        for callback in callbacks:
+            callback()
+        return GLib.SOURCE_REMOVE
+
+    def _resolve_monitor(self) -> Optional[Gdk.Monitor]:
+        """Return the monitor to show the window on, or `None` for the default."""
+        monitor = self.target_monitor
+        if monitor is None and self.settings['monitor'] is not None:
+            monitor = find_monitor(Gdk.Display.get_default(), self.settings['monitor'])
+        if monitor is not None and not monitor.is_valid():
+            return None  # disconnected in the meantime
+        return monitor
+
+    def _place_window(self):
+        """Put the window on the requested monitor, or maximize it if there is none."""
+        monitor = self._resolve_monitor()
+        if monitor == self._placed_monitor:
+            return
+        if monitor is None:
+            self.window.unfullscreen()
+            self.window.maximize()
+        else:
+            # Windows can only be put on a given monitor by making them fullscreen.
+            self.window.fullscreen_on_monitor(monitor)
+        self._placed_monitor = monitor
+
+    def _is_visible(self) -> bool:
+        return self.window is not None and self.window.is_visible()
+
+    def _after_next_paint(self, callback: Callable[[], None]):
+        """Call `callback` once the window's next frame has been painted."""
+        self._paint_callbacks.append(callback)
+        if self._paint_handler is None:
+            self._paint_handler = self.window.get_frame_clock().connect(
+                'after-paint', self._on_after_paint
+            )
+
+    def _on_after_paint(self, clock: Gdk.FrameClock):
+        clock.disconnect(self._paint_handler)
+        self._paint_handler = None
+        callbacks = self._paint_callbacks
+        self._paint_callbacks = []
+        for callback in callbacks:
+            callback()
+
+    def _record_visibility(self, requested: int):
+        self.stats.visibility_latency_ms.add((monotonic_ns() - requested) / 1e6)
+
+    def _on_realize(self, window: Gtk.Window):
+        """Time each frame, now that the window has a frame clock."""
+        clock = window.get_frame_clock()
+        clock.connect('before-paint', self._on_before_paint)
+        clock.connect('after-paint', self._on_after_paint_stats)
+        self._frame_started = None
+
+    def _on_before_paint(self, clock: Gdk.FrameClock):
+        self._frame_started = monotonic_ns()
+
+    def _on_after_paint_stats(self, clock: Gdk.FrameClock):
+        if self._frame_started is not None:
+            self.stats.frame_time_ms.add((monotonic_ns() - self._frame_started) / 1e6)
+            self._frame_started = None
+
+    def _on_contents_changed(self, terminal: Vte.Terminal):
+        self.stats.sample_output()
+
+    def save_scrollback(
+        self, path: str, format: str, callback: Callable[[Optional[str]], None]
+    ):
+        """
+        Stream the scrollback and screen to `path` in the background,
+        then call `callback` with an error message, or `None` on success.
+        """
+        save_contents(self.terminal, path, format, callback)
+
+    def _save_scrollback(self):
+        path = strftime(self.settings['scrollback_path'])
+        self.save_scrollback(
+            path, guess_format(path), partial(self._log_scrollback_saved, path)
+        )
+
+    def _log_scrollback_saved(self, path: str, error: Optional[str]):
+        if error is None:
+            _logger.info('Saved the scrollback to %s', path)
+        else:
+            _logger.warning('Failed to save the scrollback to %s: %s', path, error)
+
+    def start_search(self, pattern: str, flags: str):
+        """
+        Replace any search of the terminal's buffer with one for `pattern`.
+        Raise `InvalidPatternError` if the pattern or flags are invalid.
+        """
+        search = Search(self.terminal, pattern, flags)
+        self._cancel_search()
+        self.search = search
+
+    def _cancel_search(self):
+        search, self.search = self.search, None
+        if search is not None:
+            search.cancel()
+
+    def _toggle_search_bar(self):
+        enabled = not self.search_bar.get_search_mode()
+        self.search_bar.set_search_mode(enabled)
+        if enabled:
+            self.search_entry.grab_focus()
+        else:
+            self._on_stop_search(self.search_entry)
+
+    def _on_search_changed(self, entry: Gtk.SearchEntry):
+        pattern = entry.get_text()
+        entry.remove_css_class('error')
+        if not pattern:
+            self._cancel_search()
+            return
+        # Ignore case unless the pattern has uppercase letters.
+        flags = 'i' if pattern == pattern.lower() else ''
+        try:
+            self.start_search(pattern, flags)
+        except InvalidPatternError:
+            self._cancel_search()
+            entry.add_css_class('error')
+            return
+        # Start from the bottom of the screen, the most recent output.
+        self.search.find(True, partial(self._on_search_bar_found, self.search))
+
+    def _on_search_previous(self, entry: Gtk.SearchEntry):
+        if self.search is not None:
+            self.search.find(True, partial(self._on_search_bar_found, self.search))
+
+    def _on_search_next(self, entry: Gtk.SearchEntry):
+        if self.search is not None:
+            self.search.find(False, partial(self._on_search_bar_found, self.search))
+
+    def _on_search_bar_found(self, search: Search, found: bool):
+        if search is not self.search:
+            return  # replaced or cancelled in the meantime
+        if found:
+            self.search_entry.remove_css_class('error')
+        else:
+            self.search_entry.add_css_class('error')
+
+    def _on_stop_search(self, entry: Gtk.SearchEntry):
+        self._cancel_search()
+        entry.set_text('')
+        self.search_bar.set_search_mode(False)
+        self.terminal.grab_focus()
+
+    def _on_terminal_clicked(
+        self, gesture: Gtk.GestureClick, n_press: int, x: float, y: float
+    ):
+        if not gesture.get_current_event_state() & Gdk.ModifierType.CONTROL_MASK:
+            return
+        uri = self.terminal.check_hyperlink_at(x, y)
+        if uri is not None:
+            self._open_uri(uri)
+        else:
+            text, tag = self.terminal.check_match_at(x, y)
+            if text is None or tag not in self.link_actions:
+                return
+            self._open_link(text, tag)
+        gesture.set_state(Gtk.EventSequenceState.CLAIMED)
+
+    def _open_link(self, text: str, tag: int):
+        """Run the action of the `links` setting whose pattern matched `text`."""
+        regex, kind, value = self.link_actions[tag]
+        uri = self.terminal.get_current_directory_uri()
+        cwd = GLib.filename_from_uri(uri)[0] if uri else self.settings['home']
+        if kind == 'open':
+            uri = expand_link(regex, text, value, cwd)
+            if uri is not None:
+                self._open_uri(uri)
+        elif kind == 'run':
+            argv = [expand_link(regex, text, arg, cwd) for arg in value]
+            if None not in argv:
+                self.supervisor.launch(argv)
+
+    def _open_uri(self, uri: str):
+        """Open `uri` with the default handler, without waiting for it."""
+        Gtk.UriLauncher.new(uri).launch(self.window, None, self._on_uri_opened, uri)
 
-    def _copy_clipboard(self, widget: Gtk.Widget, args: Optional[GLib.Variant]) -> bool:
+    def _on_uri_opened(self, launcher: Gtk.UriLauncher, result: Gio.AsyncResult, uri):
+        try:
+            launcher.launch_finish(result)
+        except GLib.Error as error:
+            _logger.warning('Failed to open %s: %s', uri, error.message)
+
+    def _copy_clipboard(self):
         self.terminal.copy_clipboard_format(Vte.Format.TEXT)
-        return True
 
-    def _paste_clipboard(
-        self, widget: Gtk.Widget, args: Optional[GLib.Variant]
-    ) -> bool:
-        self.terminal.paste_clipboard()
-        return True
+    def _paste_clipboard(self):
+        """Paste the clipboard in chunks, as fast as the shell reads it."""
+        self._cancel_paste()
+        self.window.get_clipboard().read_async(
+            paste_mime_types, GLib.PRIORITY_DEFAULT, None, self._on_clipboard_read
+        )
+
+    def _on_clipboard_read(self, clipboard: Gdk.Clipboard, result: Gio.AsyncResult):
+        try:
+            stream, _ = clipboard.read_finish(result)
+        except GLib.Error as error:
+            _logger.debug('Failed to read the clipboard: %s', error.message)
+            return
+        if self.window is None:
+            return  # released in the meantime
+        self.paster = Paster(
+            self.terminal, stream, self._on_paste_progress, self._on_paste_done
+        )
+        self.paster.start()
+
+    def _on_paste_progress(self, pasted: int):
+        # Only bother showing progress for pastes that take more than one chunk.
+        if pasted <= paste_chunk_size:
+            return
+        self.paste_progress.set_text(f'Pasting… {pasted / 1e6:.1f} MB')
+        self.paste_progress.pulse()
+        self.paste_progress.set_visible(True)
+
+    def _on_paste_done(self, error: Optional[str]):
+        if error is not None:
+            _logger.warning('Paste interrupted: %s', error)
+        self.paster = None
+        self.paste_progress.set_visible(False)
+
+    def _cancel_paste(self):
+        if self.paster is not None:
+            self.paster.cancel()
+            self.paster = None
+            self.paste_progress.set_visible(False)
 
     def _autohide(self, controller: Gtk.EventControllerFocus):
         """Hide the window when it loses focus."""
-        GLib.idle_add(self.window.hide)
+        self.set_visible(False)
 
-    def _term_exited(self, terminal: Vte.Terminal, status: int):
-        """Close the window automatically when the terminal exits."""
-        self.quit()
+    def _term_exited(self, pid: int, status: int):
+        """
+        Switch to a new session when the shell exits, if the pool is enabled.
+        Otherwise, close the window automatically.
+        """
+        if pid != self.pid:
+            # A pooled shell, or one that was replaced.
+            self.pool.discard(pid)
+        elif self.pool.size > 0:
+            self.pid = None
+            self.new_session()
+        else:
+            self.quit()
 
     def quit(self):
         """Quit the GTK application."""
+        self.tmux.close()
+        if self.session_log is not None:
+            self.session_log.close()
         GLib.idle_add(self.app.quit)
 
 
-def _add_shortcut(
-    controller: Gtk.ShortcutController,
-    trigger: str,
-    handler: Callable[[Gtk.Widget, Optional[GLib.Variant], object], bool],
-):
-    """Set up a keyboard shortcut."""
-    controller.add_shortcut(
-        Gtk.Shortcut.new(
-            Gtk.ShortcutTrigger.parse_string(trigger),
-            Gtk.CallbackAction.new(handler),
-        )
+def new_window(app: Gtk.Application) -> Gtk.ApplicationWindow:
+    """Return a new undecorated, transparent and maximized window."""
+    window = Gtk.ApplicationWindow(application=app)
+    window.set_title('Terminalle')
+    # https://specifications.freedesktop.org/icon-naming-spec/latest/
+    window.set_icon_name('utilities-terminal')
+    window.set_decorated(False)
+    # Make the application window's background transparent using CSS.
+    css_provider = Gtk.CssProvider()
+    css_provider.load_from_data(
+        b'window { background-color: rgba(0, 0, 0, 0); background-image: none; }'
+    )
+    Gtk.StyleContext.add_provider_for_display(
+        window.get_display(),
+        css_provider,
+        Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
     )
+    # Maximize the window because fullscreen does not support transparency.
+    # https://gitlab.freedesktop.org/wayland/wayland-protocols/-/issues/116
+    window.maximize()
+    return window
 
 
-def _run_cmd_handler(cmd: str) -> Callable[[Gtk.Widget, Optional[GLib.Variant]], bool]:
-    def _handler(widget: Gtk.Widget, args: Optional[GLib.Variant]) -> bool:
-        Popen(cmd)
-        return True
+def find_monitor(display: Gdk.Display, name: str) -> Optional[Gdk.Monitor]:
+    """Return the monitor with the connector (e.g. `DP-1`), model or index `name`."""
+    monitors = display.get_monitors()
+    for index in range(monitors.get_n_items()):
+        monitor = monitors.get_item(index)
+        if name in (monitor.get_connector(), monitor.get_model(), str(index)):
+            return monitor
+    return None
+
+
+def monitor_names(display: Gdk.Display) -> List[str]:
+    """Return the connector names of the display's monitors."""
+    monitors = display.get_monitors()
+    return [monitors.get_item(i).get_connector() for i in range(monitors.get_n_items())]
+
+
+def new_terminal(settings: Dict[str, object]) -> Vte.Terminal:
+    """Return a new terminal widget configured according to `settings`."""
+    terminal = Vte.Terminal()
+    terminal.set_allow_bold(True)
+    terminal.set_allow_hyperlink(True)
+    apply_font(terminal, settings)
+    apply_colors(terminal, settings)
+    apply_scrollback(terminal, settings)
+    return terminal
+
 
-    return _handler
+def apply_font(terminal: Vte.Terminal, settings: Dict[str, object]):
+    terminal.set_font(font_desc=settings['font'])
+
+
+def apply_scrollback(terminal: Vte.Terminal, settings: Dict[str, object]):
+    terminal.set_scrollback_lines(settings['scrollback_lines'])
+
+
+def apply_colors(terminal: Vte.Terminal, settings: Dict[str, object]):
+    bg = settings['colors'][0].copy()
+    bg.alpha = settings['opacity']
+    terminal.set_colors(background=bg, palette=settings['colors'])
+
+
+class _Application(Gtk.Application):
+    """A GTK application that exports extra D-Bus objects as soon as possible."""
+
+    def __init__(
+        self, on_dbus_register: Callable[[Gio.DBusConnection], None], **kwargs
+    ):
+        super().__init__(**kwargs)
+        self._on_dbus_register = on_dbus_register
+
+    def do_dbus_register(
+        self, connection: Gio.DBusConnection, object_path: str
+    ) -> bool:
+        # Called during registration, before the bus name is requested.
+        if not Gtk.Application.do_dbus_register(self, connection, object_path):
+            return False
+        self._on_dbus_register(connection)
+        return True
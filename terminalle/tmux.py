@@ -0,0 +1,176 @@
+"""Persistent tmux control-mode connection for tmux-mode shortcuts."""
+
+import termios
+from collections import deque
+from fcntl import ioctl
+from shlex import quote
+from struct import pack, unpack
+from time import monotonic_ns
+from typing import List, Optional
+
+import gi
+
+gi.require_version('Gio', '2.0')
+from gi.repository import Gio, GLib
+
+from .supervisor import Supervisor
+
+# Attach flags for the control client:
+# - `no-output` suppresses `%output` notifications for every byte written to every pane.
+# - `ignore-size` keeps the control client from affecting window sizes.
+_attach_flags = 'no-output,ignore-size'
+
+# How long to wait before trying to attach again after an attempt fails
+# (e.g. because no tmux server is running), doubling up to the maximum.
+_retry_min_ms = 1000
+_retry_max_ms = 60000
+
+
+def pty_client_name(fd: int) -> Optional[str]:
+    """
+    Return the name tmux would use for a client running in the PTY
+    whose master side is `fd` (e.g. `/dev/pts/3`),
+    or `None` if it cannot be determined on this platform.
+    """
+    request = getattr(termios, 'TIOCGPTN', None)
+    if request is None:
+        return None
+    try:
+        (number,) = unpack('I', ioctl(fd, request, pack('I', 0)))
+    except OSError:
+        return None
+    return f'/dev/pts/{number}'
+
+
+class TmuxControl:
+    """
+    Runs tmux commands over a single long-lived `tmux -C` control-mode client.
+
+    Commands are written to the control client as soon as they are issued,
+    without waiting for the replies to previous commands.
+    The connection is (re-)established lazily.
+    If it cannot be established, or drops before a command is acknowledged,
+    the command is run by spawning a separate `tmux` client instead.
+    After a failed attach, commands are only spawned until a backoff expires,
+    so that each command doesn't start a control client that exits immediately.
+    """
+
+    def __init__(self, supervisor: Supervisor):
+        self.supervisor = supervisor
+        # Name of the tmux client running in the terminal (e.g. `/dev/pts/3`).
+        # Commands target this client explicitly;
+        # otherwise tmux would apply them to the control client itself.
+        self.client = None
+        # Number of commands sent over the control-mode connection.
+        self.sent = 0
+        self._process = None
+        self._stdin = None
+        # Commands sent over the connection but not yet acknowledged.
+        self._pending = deque()
+        # Whether the current control client has attached to a session.
+        self._attached = False
+        # When to next try to attach, and how long to wait after another failure.
+        self._retry_at = 0
+        self._retry_ms = _retry_min_ms
+
+    def run(self, args: List[str], target_flag: Optional[str] = None):
+        """
+        Run the tmux command `args` (without a leading `tmux`).
+
+        If `target_flag` is given (e.g. `-t`),
+        the command is directed at the terminal's tmux client using that flag.
+        """
+        if target_flag is not None and self.client is not None:
+            args = [args[0], target_flag, self.client, *args[1:]]
+        if self._process is None and (
+            monotonic_ns() < self._retry_at or not self._connect()
+        ):
+            self._spawn(args)
+            return
+        line = ' '.join(quote(arg) for arg in args) + '\n'
+        self._pending.append(args)
+        self.sent += 1
+        try:
+            self._stdin.write_all(line.encode(), None)
+        except GLib.Error:
+            self._disconnect(self._process)
+
+    def close(self):
+        """Detach the control client, if connected."""
+        if self._process is not None:
+            process = self._process
+            self._process = None
+            self._stdin = None
+            self._pending.clear()
+            process.force_exit()
+
+    def _connect(self) -> bool:
+        argv = ['tmux', '-C', 'attach-session', '-f', _attach_flags]
+        if self.client is not None:
+            argv += ['-t', self.client]
+        try:
+            process = Gio.Subprocess.new(
+                argv,
+                Gio.SubprocessFlags.STDIN_PIPE
+                | Gio.SubprocessFlags.STDOUT_PIPE
+                | Gio.SubprocessFlags.STDERR_SILENCE,
+            )
+        except GLib.Error:
+            self._back_off()
+            return False
+        self._process = process
+        self._attached = False
+        self._stdin = process.get_stdin_pipe()
+        stdout = Gio.DataInputStream.new(process.get_stdout_pipe())
+        stdout.read_line_async(GLib.PRIORITY_DEFAULT, None, self._on_line, process)
+        return True
+
+    def _on_line(
+        self,
+        stdout: Gio.DataInputStream,
+        result: Gio.AsyncResult,
+        process: Gio.Subprocess,
+    ):
+        """Consume one line of control-mode output."""
+        try:
+            line, _ = stdout.read_line_finish(result)
+        except GLib.Error:
+            line = None
+        if process is not self._process:
+            return  # stale connection
+        if line is None:
+            self._disconnect(process)
+            return
+        # Command replies are framed by `%begin`/`%end` (or `%error`) guard lines
+        # of the form `%end <time> <number> <flags>`,
+        # where flags are 1 for commands sent by this client.
+        fields = line.split(b' ')
+        if fields[0] == b'%session-changed':
+            # Sent once the control client has attached.
+            self._attached = True
+            self._retry_ms = _retry_min_ms
+        elif fields[0] in (b'%end', b'%error') and fields[-1] == b'1':
+            if self._pending:
+                self._pending.popleft()
+        elif fields[0] == b'%exit':
+            self._disconnect(process)
+            return
+        stdout.read_line_async(GLib.PRIORITY_DEFAULT, None, self._on_line, process)
+
+    def _disconnect(self, process: Gio.Subprocess):
+        """Drop the connection and re-run any unacknowledged commands by spawning."""
+        if process is not self._process:
+            return
+        pending = list(self._pending)
+        if not self._attached:
+            self._back_off()
+        self.close()
+        for args in pending:
+            self._spawn(args)
+
+    def _back_off(self):
+        self._retry_at = monotonic_ns() + self._retry_ms * 1_000_000
+        self._retry_ms = min(2 * self._retry_ms, _retry_max_ms)
+
+    def _spawn(self, args: List[str]):
+        self.supervisor.launch(['tmux', *args])
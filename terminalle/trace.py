@@ -0,0 +1,112 @@
+"""
+Record instrumentation marks as a Chrome trace.
+
+The output is in the [trace event format], which can be viewed
+with Perfetto (https://ui.perfetto.dev) or `chrome://tracing`.
+
+[trace event format]: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYIZfqhyWfy2m_SHJ9-I
+"""
+
+import json
+from os import getpid
+from time import monotonic_ns
+from typing import Dict, List, Optional
+
+from .instrument import add_hook, remove_hook
+
+# How often to check whether the main loop is responsive.
+_heartbeat_ms = 10
+
+
+class Tracer:
+    """Collects trace events from instrumentation marks."""
+
+    def __init__(self, stall_threshold_ms: float = 50):
+        self.stall_threshold_ms = stall_threshold_ms
+        self.events: List[Dict[str, object]] = [
+            {
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': getpid(),
+                'tid': 0,
+                'args': {'name': 'terminalle'},
+            }
+        ]
+        # Start times of the spans opened by `instrument.span()`, innermost last.
+        self._open = []
+        self._heartbeat = None
+        self._async_id = 0
+        # IDs of asynchronous spans in progress, by name.
+        self._async_ids = {}
+
+    def start(self):
+        """Start recording marks."""
+        add_hook(self._on_mark)
+
+    def stop(self):
+        """Stop recording marks and watching the main loop."""
+        remove_hook(self._on_mark)
+        if self._heartbeat is not None:
+            from gi.repository import GLib
+
+            GLib.source_remove(self._heartbeat)
+            self._heartbeat = None
+
+    def watch_main_loop(self):
+        """
+        Record stalls of the default main loop longer than the threshold,
+        by checking how late a periodic timeout is dispatched.
+        """
+        from gi.repository import GLib
+
+        self._expected = monotonic_ns() + _heartbeat_ms * 1_000_000
+        self._heartbeat = GLib.timeout_add(
+            _heartbeat_ms, self._on_heartbeat, priority=GLib.PRIORITY_HIGH
+        )
+
+    def _on_heartbeat(self) -> bool:
+        now = monotonic_ns()
+        if (now - self._expected) / 1e6 > self.stall_threshold_ms:
+            self._event(
+                'main-loop-stall', 'X', self._expected, dur=now - self._expected
+            )
+        self._expected = now + _heartbeat_ms * 1_000_000
+        return True
+
+    def _on_mark(self, name: str, time: int):
+        base, _, kind = name.rpartition(':')
+        if kind == 'begin':
+            self._open.append(time)
+        elif kind == 'end' and self._open:
+            begin = self._open.pop()
+            self._event(base, 'X', begin, dur=time - begin)
+        elif kind == 'async-begin':
+            self._async_id += 1
+            self._async_ids[base] = self._async_id
+            self._event(base, 'b', time, id=self._async_id, cat='async')
+        elif kind == 'async-end' and base in self._async_ids:
+            id = self._async_ids.pop(base)
+            self._event(base, 'e', time, id=id, cat='async')
+        else:
+            self._event(name, 'i', time, s='t')
+
+    def _event(
+        self, name: str, phase: str, time: int, dur: Optional[int] = None, **kwargs
+    ):
+        # Timestamps and durations are in microseconds.
+        event = {
+            'name': name,
+            'ph': phase,
+            'ts': time / 1e3,
+            'pid': self.events[0]['pid'],
+            'tid': 0,
+            **kwargs,
+        }
+        if dur is not None:
+            event['dur'] = dur / 1e3
+        self.events.append(event)
+
+    def write(self, path: str):
+        """Write the events recorded so far to `path`."""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)